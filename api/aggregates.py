@@ -0,0 +1,121 @@
+import bisect
+import threading
+from typing import Dict, Iterable, List, Optional
+from api.columnar import epoch_micros
+from api.models import SubmissionData
+from api.service import generate_insights, improvement_trend
+
+# Number of most recent accuracies (by submitted_at) kept per user for the trend chart
+TREND_SIZE = 50
+
+
+class UserAggregate:
+    """Running sums behind a user's analysis dict, updated in O(1) per submission."""
+
+    def __init__(self, trend_size: int = TREND_SIZE):
+        self.total_accuracy = 0
+        self.total_score = 0
+        self.total_final_score = 0
+        self.total_negative_score = 0
+        self.total_rank = 0
+        self.total_mistakes_corrected = 0
+        self.total_quizzes = 0
+        self.topic_performance: Dict[str, Dict[str, int]] = {}
+        self.trend_size = trend_size
+        self.accuracy_trends: List[float] = []  # In submitted_at order, like analyze_performance
+        self._trend_timestamps: List[int] = []  # Parallel epoch-microsecond keys for bisect
+
+        # Earliest and latest submissions by time (epoch microseconds), independent of arrival order
+        self.first_timestamp = None
+        self.first_accuracy = None
+        self.last_timestamp = None
+        self.last_accuracy = None
+
+    def add(self, submission: SubmissionData):
+        # Naive and aware times share one key, as in UserIndex and SubmissionColumns
+        timestamp = epoch_micros(submission.submitted_at)
+        accuracy_numeric = submission.accuracy
+        self.total_quizzes += 1
+        self.total_accuracy += accuracy_numeric
+        self.total_score += submission.score
+        self.total_final_score += submission.final_score
+        self.total_negative_score += submission.negative_score
+        self.total_rank += submission.better_than
+        self.total_mistakes_corrected += submission.mistakes_corrected
+
+        topic = submission.quiz.topic
+        if topic:
+            performance = self.topic_performance.get(topic)
+            if performance is None:
+                performance = self.topic_performance[topic] = {'correct': 0, 'total': 0, 'mistakes': 0}
+            performance['correct'] += submission.correct_answers
+            performance['total'] += submission.total_questions
+            performance['mistakes'] += submission.incorrect_answers
+
+        # A back-dated submission lands in its place in time; equal timestamps keep arrival order
+        position = bisect.bisect_right(self._trend_timestamps, timestamp)
+        self._trend_timestamps.insert(position, timestamp)
+        self.accuracy_trends.insert(position, accuracy_numeric)
+        if len(self.accuracy_trends) > self.trend_size:
+            del self._trend_timestamps[0], self.accuracy_trends[0]
+
+        # Ties keep the earliest arrival as first and the latest arrival as last, like a stable sort
+        if self.first_timestamp is None or timestamp < self.first_timestamp:
+            self.first_timestamp, self.first_accuracy = timestamp, accuracy_numeric
+        if self.last_timestamp is None or timestamp >= self.last_timestamp:
+            self.last_timestamp, self.last_accuracy = timestamp, accuracy_numeric
+
+    def analysis(self):
+        return {
+            'total_accuracy': self.total_accuracy,
+            'total_score': self.total_score,
+            'total_final_score': self.total_final_score,
+            'total_negative_score': self.total_negative_score,
+            'total_rank': self.total_rank,
+            'total_mistakes_corrected': self.total_mistakes_corrected,
+            'total_quizzes': self.total_quizzes,
+            'topic_performance': {topic: dict(performance) for topic, performance in self.topic_performance.items()},
+            'accuracy_trends': list(self.accuracy_trends)
+        }
+
+    def insights(self):
+        # The trend buffer is bounded, so the improvement trend comes from the tracked endpoints
+        insights = generate_insights(self.analysis())
+        insights['Improvement Trends'] = improvement_trend(self.first_accuracy, self.last_accuracy)
+        return insights
+
+
+class AggregateStore:
+    """Per-user aggregates keyed by user_id."""
+
+    def __init__(self, trend_size: int = TREND_SIZE):
+        self.trend_size = trend_size
+        self._users: Dict[str, UserAggregate] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_submissions(cls, submissions: Iterable[SubmissionData], trend_size: int = TREND_SIZE) -> "AggregateStore":
+        store = cls(trend_size)
+        for submission in submissions:
+            store.add(submission)
+        return store
+
+    def add(self, submission: SubmissionData) -> UserAggregate:
+        with self._lock:
+            aggregate = self._users.get(submission.user_id)
+            if aggregate is None:
+                aggregate = UserAggregate(self.trend_size)
+                aggregate.add(submission)
+                self._users[submission.user_id] = aggregate  # Only once the first submission was accepted
+            else:
+                aggregate.add(submission)
+            return aggregate
+
+    def get(self, user_id: str) -> Optional[UserAggregate]:
+        return self._users.get(user_id)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._users
+
+    def __len__(self) -> int:
+        return len(self._users)
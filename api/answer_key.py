@@ -0,0 +1,90 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+
+UNKNOWN_DIFFICULTY = "unknown"
+INT64_LIMIT = 2 ** 63
+
+
+def _question_id(key: str) -> Optional[int]:
+    # Response map keys are free-form strings; one that is not a question id cannot match the quiz
+    try:
+        question_id = int(key)
+    except ValueError:
+        return None
+    return question_id if -INT64_LIMIT <= question_id < INT64_LIMIT else None
+
+
+# Dense, question-sorted view of a quiz's answers, built once per quiz
+@dataclass(frozen=True)
+class AnswerKey:
+    quiz_id: int
+    question_ids: np.ndarray  # Sorted, so response keys resolve with np.searchsorted
+    correct_option_ids: np.ndarray  # -1 when no option is flagged correct
+    topic_ids: np.ndarray
+    difficulty_codes: np.ndarray  # Index into difficulty_levels
+    difficulty_levels: List[str]
+    topic_names: Dict[int, str]
+
+    def __len__(self) -> int:
+        return len(self.question_ids)
+
+    @classmethod
+    def from_quiz_data(cls, quiz: Dict[str, Any]) -> "AnswerKey":
+        # Built from the raw quiz JSON: the nested Question/Option models are not populated by Quiz
+        questions = sorted(quiz.get("questions") or [], key=lambda question: question["id"])
+        correct_option_ids = []
+        for question in questions:
+            correct = [option["id"] for option in question.get("options") or [] if option.get("is_correct")]
+            correct_option_ids.append(correct[0] if correct else -1)
+
+        difficulty_index: Dict[str, int] = {}
+        difficulty_codes = [
+            difficulty_index.setdefault(UNKNOWN_DIFFICULTY if question.get("difficulty_level") is None else str(question["difficulty_level"]), len(difficulty_index))
+            for question in questions
+        ]
+        topic_names: Dict[int, str] = {}
+        for question in questions:
+            topic_names.setdefault(question.get("topic_id", -1), question.get("topic", ""))
+
+        return cls(
+            quiz_id=quiz.get("id"),
+            question_ids=np.array([question["id"] for question in questions], dtype=np.int64),
+            correct_option_ids=np.array(correct_option_ids, dtype=np.int64),
+            topic_ids=np.array([question.get("topic_id", -1) for question in questions], dtype=np.int64),
+            difficulty_codes=np.array(difficulty_codes, dtype=np.int64),
+            difficulty_levels=list(difficulty_index),
+            topic_names=topic_names,
+        )
+
+    def score(self, response_maps: Sequence[Dict[str, int]]) -> "ResponseMatrix":
+        # Flatten every (submission, question, option) triple, then resolve them all in one searchsorted.
+        # Non-numeric keys are skipped here, like questions outside the quiz below.
+        responses = [
+            [(question_id, option_id) for key, option_id in response_map.items() if (question_id := _question_id(key)) is not None]
+            for response_map in response_maps
+        ]
+        counts = np.fromiter((len(pairs) for pairs in responses), dtype=np.int64, count=len(responses))
+        rows = np.repeat(np.arange(len(responses)), counts)
+        question_ids = np.fromiter((question_id for pairs in responses for question_id, _ in pairs), dtype=np.int64, count=int(counts.sum()))
+        option_ids = np.fromiter((option_id for pairs in responses for _, option_id in pairs), dtype=np.int64, count=int(counts.sum()))
+
+        columns = np.searchsorted(self.question_ids, question_ids)
+        known = columns < len(self.question_ids)
+        known[known] = self.question_ids[columns[known]] == question_ids[known]  # Ignore questions outside this quiz
+        rows, columns, option_ids = rows[known], columns[known], option_ids[known]
+
+        shape = (len(response_maps), len(self.question_ids))
+        answered = np.zeros(shape, dtype=bool)
+        correct = np.zeros(shape, dtype=bool)
+        answered[rows, columns] = True
+        correct[rows, columns] = option_ids == self.correct_option_ids[columns]
+        return ResponseMatrix(correct=correct, incorrect=answered & ~correct, unanswered=~answered)
+
+
+# Submissions x questions outcome masks
+@dataclass(frozen=True)
+class ResponseMatrix:
+    correct: np.ndarray
+    incorrect: np.ndarray
+    unanswered: np.ndarray
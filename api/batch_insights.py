@@ -0,0 +1,154 @@
+import argparse
+import heapq
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional, Tuple
+from api.ingest import IngestError, iter_records, iter_submission_chunks
+from api.insights_file import INSIGHTS_PATH, InsightsFile, InsightsWriter
+from api.service import analyze_performance, generate_insights
+from api.user_index import UserIndex
+
+logger = logging.getLogger(__name__)
+
+SHARDS = 64
+
+
+def shard_of(user_id: str, shards: int) -> int:
+    # Stable across processes and runs, unlike hash()
+    return zlib.crc32(user_id.encode("utf-8")) % shards
+
+
+def _source_signature(path: str, shards: int) -> dict:
+    stat = os.stat(path)
+    return {"source": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "shards": shards}
+
+
+def partition(path: str, work_directory: str, shards: int) -> Tuple[int, int]:
+    # Split the history into per-shard NDJSON files so every user lands in exactly one shard.
+    # Skipped when a finished partition of the same file and shard count is already on disk.
+    marker = os.path.join(work_directory, "partition.json")
+    signature = _source_signature(path, shards)
+    if os.path.exists(marker):
+        with open(marker) as file:
+            done = json.load(file)
+        if done["signature"] == signature:
+            return done["records"], done["errors"]
+        shutil.rmtree(work_directory)  # A different input invalidates every part
+    os.makedirs(work_directory, exist_ok=True)
+
+    errors = 0
+
+    def on_error(error: IngestError):
+        nonlocal errors
+        logger.warning("Skipping record %s: %s", error.position, error.message)
+        errors += 1
+
+    records = 0
+    outputs = [open(_shard_path(work_directory, shard), "w", encoding="utf-8") for shard in range(shards)]
+    try:
+        for position, record, text, _ in iter_records(path, on_error):
+            user_id = record.get("user_id") if isinstance(record, dict) else None
+            if not isinstance(user_id, str):
+                on_error(IngestError(position, "Record has no user_id"))
+                continue
+            line = text.strip()
+            if "\n" in line:  # Pretty-printed array elements need re-encoding to fit on one line
+                line = json.dumps(record)
+            outputs[shard_of(user_id, shards)].write(line + "\n")
+            records += 1
+    finally:
+        for output in outputs:
+            output.close()
+
+    with open(marker, "w") as file:
+        json.dump({"signature": signature, "records": records, "errors": errors}, file)
+    return records, errors
+
+
+def _shard_path(work_directory: str, shard: int) -> str:
+    return os.path.join(work_directory, f"shard-{shard:05d}.ndjson")
+
+
+def _part_path(work_directory: str, shard: int) -> str:
+    return os.path.join(work_directory, f"shard-{shard:05d}.part")
+
+
+def process_shard(work_directory: str, shard: int, trusted: bool) -> Tuple[int, int, int]:
+    # Runs in a worker: analyze every user of one shard and write their results as a sorted part file
+    submissions = [submission for chunk in iter_submission_chunks(_shard_path(work_directory, shard), trusted=trusted) for submission in chunk]
+    index = UserIndex.from_submissions(submissions)
+    users = sorted({submission.user_id for submission in submissions})
+    with InsightsWriter(_part_path(work_directory, shard)) as writer:
+        for user_id in users:
+            analysis = analyze_performance(index.get(user_id))
+            result = {"analysis": analysis, "insights": generate_insights(analysis)}
+            writer.add(user_id, json.dumps(result, separators=(",", ":")).encode("utf-8"))
+    return shard, len(users), len(submissions)
+
+
+def merge(work_directory: str, shards: int, output: str) -> int:
+    # Shards hold disjoint users, so a k-way merge of the sorted parts gives one sorted file
+    parts = [InsightsFile(_part_path(work_directory, shard)) for shard in range(shards)]
+    try:
+        with InsightsWriter(output) as writer:
+            for user_id, blob in heapq.merge(*(part.items() for part in parts), key=lambda item: item[0].encode("utf-8")):
+                writer.add(user_id, blob)
+            return len(writer)
+    finally:
+        for part in parts:
+            part.close()
+
+
+def run(path: str, output: str = INSIGHTS_PATH, workers: Optional[int] = None, shards: int = SHARDS,
+        trusted: bool = False, work_directory: Optional[str] = None, keep_work: bool = False) -> int:
+    work_directory = work_directory or f"{output}.work"
+    started = time.perf_counter()
+    records, errors = partition(path, work_directory, shards)
+    print(f"Partitioned {records:,} submissions into {shards} shards ({errors} skipped) in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    # Shards with a finished part file are skipped, so an interrupted run picks up where it stopped
+    pending = [shard for shard in range(shards) if not os.path.exists(_part_path(work_directory, shard))]
+    if len(pending) < shards:
+        print(f"Resuming: {shards - len(pending)} of {shards} shards already done", file=sys.stderr)
+
+    processed_users = processed_records = 0
+    analysis_started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(process_shard, work_directory, shard, trusted) for shard in pending]
+        for done, future in enumerate(as_completed(futures), start=1):
+            _, users, shard_records = future.result()
+            processed_users += users
+            processed_records += shard_records
+            elapsed = time.perf_counter() - analysis_started
+            print(f"[{done}/{len(pending)} shards] {processed_users:,} users, {processed_records:,} submissions, "
+                  f"{processed_records / elapsed if elapsed > 0 else 0:,.0f} submissions/s", file=sys.stderr)
+
+    users = merge(work_directory, shards, output)
+    if not keep_work:
+        shutil.rmtree(work_directory)
+    print(f"Wrote insights for {users:,} users to {output} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return users
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Precompute analysis and insights for every user into a memory-mappable file.")
+    parser.add_argument("path", help="Historical submissions (NDJSON or JSON array)")
+    parser.add_argument("--output", default=INSIGHTS_PATH)
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per core)")
+    parser.add_argument("--shards", type=int, default=SHARDS, help="Number of user shards; more shards give finer-grained resume")
+    parser.add_argument("--trusted", action="store_true", help="Skip model validation for data that was already validated")
+    parser.add_argument("--work-dir", help="Scratch directory for shards and parts (default: <output>.work)")
+    parser.add_argument("--keep-work", action="store_true", help="Keep the scratch directory after a successful run")
+    args = parser.parse_args(argv)
+    run(args.path, args.output, args.workers, args.shards, args.trusted, args.work_dir, args.keep_work)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main()
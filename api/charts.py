@@ -0,0 +1,151 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Optional
+from api.metrics import STAGE_ERRORS, STAGE_SECONDS
+
+CHART_NAMES = ("accuracy_trends", "topic_performance")
+CHART_DIRECTORY = "charts"
+CHART_CACHE_BYTES = 64 * 1024 * 1024
+
+_CHART_FILE = re.compile(r"^(?P<key>[0-9a-f]{64})-(?P<name>[a-z_]+)\.png$")
+
+
+def chart_key(analysis_data) -> str:
+    # Hash only the fields the charts are drawn from
+    payload = {
+        'accuracy_trends': analysis_data['accuracy_trends'],
+        'topic_performance': analysis_data['topic_performance'],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def render_charts(analysis_data, directory: str, key: str) -> int:
+    # Runs in a worker process: render into a scratch directory, then move the files into place
+    from api.service import visualize_performance
+
+    scratch = tempfile.mkdtemp(prefix=f".{key}-", dir=directory)
+    try:
+        visualize_performance(analysis_data, output_dir=scratch, prefix=f"{key}-")
+        size = 0
+        for name in CHART_NAMES:
+            filename = f"{key}-{name}.png"
+            os.replace(os.path.join(scratch, filename), os.path.join(directory, filename))
+            size += os.path.getsize(os.path.join(directory, filename))
+        return size
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+class ChartCache:
+    """Content-addressed PNG cache; misses are rendered in a background process pool."""
+
+    def __init__(self, directory: str = CHART_DIRECTORY, max_bytes: int = CHART_CACHE_BYTES, max_workers: Optional[int] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # key -> bytes on disk, least recently used first
+        self._pending: Dict[str, Future] = {}
+        self._size = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def request(self, analysis_data) -> str:
+        # Returns the chart key immediately; rendering happens off the request path
+        key = chart_key(analysis_data)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return key
+            if key in self._pending:
+                return key
+            started = time.perf_counter()
+            future = self._pool().submit(render_charts, analysis_data, self.directory, key)
+            self._pending[key] = future
+        future.add_done_callback(lambda done: self._finish(key, done, started))
+        return key
+
+    def path(self, key: str, name: str, timeout: float = 0) -> Optional[str]:
+        # Waits up to `timeout` seconds for an in-flight render of the same key
+        if name not in CHART_NAMES:
+            return None
+        with self._lock:
+            future = self._pending.get(key)
+        if future is not None and timeout > 0:
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                return None
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+        return os.path.join(self.directory, f"{key}-{name}.png")
+
+    def is_pending(self, key: str) -> bool:
+        with self._lock:
+            return key in self._pending
+
+    def urls(self, key: str) -> Dict[str, str]:
+        return {name: f"/charts/{key}/{name}.png" for name in CHART_NAMES}
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # Spawned workers keep forked server threads and locks out of the renderer
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return self._executor
+
+    def _finish(self, key: str, future: Future, started: float):
+        # Rendering happens in another process, so the stage is timed from submit to completion
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage="chart_rendering")
+        with self._lock:
+            self._pending.pop(key, None)
+            if future.cancelled() or future.exception() is not None:
+                STAGE_ERRORS.inc(stage="chart_rendering")
+                return
+            self._entries[key] = future.result()
+            self._size += self._entries[key]
+            self._evict()
+
+    def _evict(self):
+        # Drop least recently used charts until the cache fits, always keeping the newest entry
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            for name in CHART_NAMES:
+                try:
+                    os.remove(os.path.join(self.directory, f"{key}-{name}.png"))
+                except FileNotFoundError:
+                    pass
+
+    def _scan(self):
+        # Adopt charts rendered by a previous run, oldest first
+        found: Dict[str, Dict[str, os.stat_result]] = {}
+        for filename in os.listdir(self.directory):
+            match = _CHART_FILE.match(filename)
+            if match and match.group("name") in CHART_NAMES:
+                found.setdefault(match.group("key"), {})[match.group("name")] = os.stat(os.path.join(self.directory, filename))
+        complete = [(key, stats) for key, stats in found.items() if len(stats) == len(CHART_NAMES)]
+        for key, stats in sorted(complete, key=lambda item: max(stat.st_mtime for stat in item[1].values())):
+            self._entries[key] = sum(stat.st_size for stat in stats.values())
+            self._size += self._entries[key]
+        self._evict()
@@ -0,0 +1,76 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Sequence
+import numpy as np
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Integer columns are summed exactly; float columns keep the dtype the models use
+_INT_FIELDS = ("score", "better_than", "mistakes_corrected", "correct_answers", "incorrect_answers", "total_questions")
+_FLOAT_FIELDS = ("accuracy", "final_score", "negative_score")
+
+
+def epoch_micros(value: datetime) -> int:
+    # Exact integer timestamp; naive datetimes are treated as UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+
+@dataclass(frozen=True)
+class SubmissionColumns:
+    """Column-per-field view of a list of submissions, with topics coded as integers."""
+
+    score: np.ndarray
+    accuracy: np.ndarray
+    final_score: np.ndarray
+    negative_score: np.ndarray
+    better_than: np.ndarray
+    mistakes_corrected: np.ndarray
+    correct_answers: np.ndarray
+    incorrect_answers: np.ndarray
+    total_questions: np.ndarray
+    submitted_at: np.ndarray  # Epoch microseconds
+    topic_codes: np.ndarray  # Index into `topics`, -1 when the quiz has no topic
+    topics: List[str]  # Ordered by first appearance
+
+    def __len__(self) -> int:
+        return len(self.score)
+
+    @classmethod
+    def from_submissions(cls, submissions: Sequence) -> "SubmissionColumns":
+        count = len(submissions)
+        columns = {
+            field: np.fromiter((getattr(s, field) for s in submissions), dtype=np.int64, count=count)
+            for field in _INT_FIELDS
+        }
+        columns.update({
+            field: np.fromiter((getattr(s, field) for s in submissions), dtype=np.float64, count=count)
+            for field in _FLOAT_FIELDS
+        })
+        columns["submitted_at"] = np.fromiter((epoch_micros(s.submitted_at) for s in submissions), dtype=np.int64, count=count)
+
+        # Code topics in first-appearance order so grouped sums keep the dict order of the row-wise loop
+        topic_index: Dict[str, int] = {}
+        codes = np.full(count, -1, dtype=np.int32)
+        for row, submission in enumerate(submissions):
+            topic = submission.quiz.topic
+            if topic:
+                codes[row] = topic_index.setdefault(topic, len(topic_index))
+        return cls(topic_codes=codes, topics=list(topic_index), **columns)
+
+    @classmethod
+    def concat(cls, parts: Sequence["SubmissionColumns"]) -> "SubmissionColumns":
+        # Merge topic vocabularies, remapping each part's codes into the combined one
+        topic_index: Dict[str, int] = {}
+        codes = []
+        for part in parts:
+            remap = np.array([topic_index.setdefault(topic, len(topic_index)) for topic in part.topics] + [-1], dtype=np.int32)
+            codes.append(remap[part.topic_codes])  # Code -1 picks the trailing -1
+        fields = _INT_FIELDS + _FLOAT_FIELDS + ("submitted_at",)
+        columns = {
+            field: np.concatenate([getattr(part, field) for part in parts]) if parts else np.empty(0, dtype=np.float64 if field in _FLOAT_FIELDS else np.int64)
+            for field in fields
+        }
+        topic_codes = np.concatenate(codes) if codes else np.empty(0, dtype=np.int32)
+        return cls(topic_codes=topic_codes, topics=list(topic_index), **columns)
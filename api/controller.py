@@ -1,52 +1,230 @@
-from fastapi import APIRouter, HTTPException, FastAPI
-from typing import List
-from api.service import analyze_performance, generate_insights, predict_rank, predict_college, visualize_performance
-from api.utils import train_rank_predictor
-from api.models import SubmissionData, Quiz
-from api.utils import json_files
+from fastapi import APIRouter, HTTPException, FastAPI, Request
+from fastapi.responses import FileResponse
+from dataclasses import asdict
+from collections import deque
+from typing import Deque, List, Optional
+import logging
+import os
+import threading
+from api.service import analyze_performance, generate_insights, predict_rank
+from api.service import predict_rank_batch, predict_college_batch, analyze_columns, analyze_responses
+from api.models import CollegeBatchPredictionRequest, CollegePredictionRequest, SubmissionData
+from api.utils import rank_training_data
+from api.registry import RankModelRegistry
+from api.aggregates import AggregateStore
+from api.user_index import UserIndex
+from api.charts import ChartCache
+from api.snapshot import DataSnapshot, SnapshotLoader
+from api.store import SubmissionStore
+from api.percentiles import PercentileEngine
+from api.cutoffs import college_cutoffs
+from api.insights_file import INSIGHTS_PATH, InsightsFile
+from api.response_cache import ResponseCache, json_body
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 app = FastAPI()
 
-# Load data for current quiz, historical data, and submission data
-current_quiz_data, historical_data, submission_data = json_files("current_quiz_data", "historical_data", "submission_data")
+# Current quiz, historical and submission data, reloaded in the background when the files change
+data_snapshots = SnapshotLoader()
+data_snapshots.start()
+
+# College cutoff tables (data/college_cutoffs.csv), reloaded the same way
+college_cutoffs.start()
+
+# Per-user submissions sorted by time (index) and running sums (aggregates), rebuilt per snapshot
+user_index: UserIndex = UserIndex()
+user_aggregates: AggregateStore = AggregateStore()
+
+# Final-score distributions per quiz and per topic for percentile lookups, rebuilt per snapshot
+score_percentiles: PercentileEngine = PercentileEngine()
+
+# Submissions accepted by POST /submissions since startup, replayed onto every rebuilt state.
+# Entries leave once the history file holds them; past the limit the oldest are dropped (the
+# optional database keeps them). The lock covers the replay-and-swap and each add, so no add
+# can land in a replaced object.
+LIVE_SUBMISSION_LIMIT = 10_000
+live_submissions: Deque[SubmissionData] = deque(maxlen=LIVE_SUBMISSION_LIMIT)
+user_state_lock = threading.Lock()
+
+def rebuild_user_state(snapshot: DataSnapshot):
+    global user_index, user_aggregates, score_percentiles
+    index = UserIndex.from_submissions(snapshot.historical_submissions)
+    aggregates = AggregateStore.from_submissions(index.submissions())
+    percentiles = PercentileEngine.from_submissions(snapshot.historical_submissions)
+    historical_ids = {submission.id for submission in snapshot.historical_submissions if submission.id is not None}
+    with user_state_lock:
+        # Drain live submissions that have since been written into the history file, replay the rest
+        pending = [submission for submission in live_submissions if submission.id is None or submission.id not in historical_ids]
+        live_submissions.clear()
+        for submission in pending:
+            try:
+                add_submission(submission, index, aggregates, percentiles)
+            except Exception:
+                logger.exception("Dropping live submission %s that no longer applies", submission.id)
+                continue
+            live_submissions.append(submission)
+        user_index, user_aggregates, score_percentiles = index, aggregates, percentiles
+
+def add_submission(submission: SubmissionData, index: UserIndex, aggregates: AggregateStore, percentiles: PercentileEngine):
+    # Aggregates first: they are the only update that can reject a submission, before anything else changes
+    aggregate = aggregates.add(submission)
+    percentiles.add(submission)
+    index.add(submission)
+    return aggregate
+
+data_snapshots.subscribe(rebuild_user_state)
+
+# Charts are rendered in the background and served by content hash
+chart_cache = ChartCache()
+
+# Rank model is fitted once per historical dataset and reused across requests
+rank_models = RankModelRegistry("data/rank_model.npz")
+
+# Serialized (and gzipped) bodies of the snapshot-wide GET routes, kept per data version
+response_cache = ResponseCache()
 
-# Initialize objects
-quiz_data: Quiz = Quiz(**current_quiz_data.get("quiz"))
-historical_submissions: List[SubmissionData] = [SubmissionData(**data) for data in historical_data]
-submitted_data: SubmissionData = SubmissionData(**submission_data)
+# Per-user results precomputed by `python -m api.batch_insights`, read at startup when present;
+# they answer the user routes for users outside the loaded history
+precomputed_insights: Optional[InsightsFile] = InsightsFile(INSIGHTS_PATH) if os.path.exists(INSIGHTS_PATH) else None
 
-@app.post("/analyze-performance")
+# Optional SQLite store (e.g. RANK_PREDICTOR_DATABASE=sqlite:///data/submissions.db) that keeps posted submissions
+# across restarts and serves /submissions/analysis. Startup state still comes from the JSON snapshot above.
+database_url = os.environ.get("RANK_PREDICTOR_DATABASE")
+submission_store: Optional[SubmissionStore] = SubmissionStore(database_url) if database_url else None
+
+@router.post("/analyze-performance")
 def analyze_performance_endpoint(user_data: List[SubmissionData]):
     analysis_data = analyze_performance(user_data)
     insights = generate_insights(analysis_data)
-    visualize_performance(analysis_data)  # Call the visualization function here
-    return {"analysis": analysis_data, "insights": insights}
+    chart_key = chart_cache.request(analysis_data)  # Rendered off the request path
+    return {"analysis": analysis_data, "insights": insights, "charts": chart_cache.urls(chart_key)}
+
+@router.get("/charts/{key}/{name}.png")
+def get_chart(key: str, name: str):
+    # Give an in-flight render a moment to finish before reporting the chart as missing
+    path = chart_cache.path(key, name, timeout=10)
+    if path is None:
+        if chart_cache.is_pending(key):
+            raise HTTPException(status_code=503, detail="Chart is still rendering", headers={"Retry-After": "1"})
+        raise HTTPException(status_code=404, detail=f"Chart not found: {key}/{name}")
+    # Content-addressed, so the bytes behind a URL never change
+    return FileResponse(path, media_type="image/png", headers={"Cache-Control": "public, max-age=31536000, immutable"})
 
 @router.get("/analyze-performance")
-def get_performance_analysis():
+def get_performance_analysis(request: Request):
     try:
-        # Analyze user performance based on historical submissions
-        analysis_data = analyze_performance(historical_submissions) 
-        return analysis_data
+        # Analyze user performance based on historical submissions, once per data version
+        snapshot = data_snapshots.current()
+        return response_cache.respond(
+            request, "analyze-performance", snapshot.version, snapshot.modified_at,
+            lambda: json_body(analyze_columns(snapshot.historical_columns)),
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error analyzing performance: {str(e)}")
 
 @router.get("/generate-insights")
-def get_performance_insights():
+def get_performance_insights(request: Request):
     try:
-        # Analyze performance and generate insights
-        analysis_data = analyze_performance(historical_submissions)
-        insights = generate_insights(analysis_data)
-        return insights
+        # Analyze performance and generate insights, once per data version
+        snapshot = data_snapshots.current()
+        return response_cache.respond(
+            request, "generate-insights", snapshot.version, snapshot.modified_at,
+            lambda: json_body(generate_insights(analyze_columns(snapshot.historical_columns))),
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating insights: {str(e)}")
 
+@router.get("/question-analysis")
+def get_question_analysis():
+    try:
+        # Score the current submission and any historical submissions of the current quiz
+        snapshot = data_snapshots.current()
+        submissions = list(snapshot.historical_submissions) + [snapshot.submission]
+        return analyze_responses(snapshot.answer_key, submissions)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error analyzing responses: {str(e)}")
+
+@router.post("/question-analysis")
+def post_question_analysis(submissions: List[SubmissionData]):
+    try:
+        # Submissions for other quizzes are skipped
+        return analyze_responses(data_snapshots.current().answer_key, submissions)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error analyzing responses: {str(e)}")
+
+@router.get("/users/{user_id}/analysis")
+def get_user_performance_analysis(user_id: str):
+    user_submissions = user_index.get(user_id)
+    if user_submissions is None:
+        precomputed = precomputed_insights.get(user_id) if precomputed_insights is not None else None
+        if precomputed is None:
+            raise HTTPException(status_code=404, detail=f"No submissions found for user {user_id}")
+        return precomputed["analysis"]
+    try:
+        # Analyze only this user's submissions, already in time order
+        return analyze_performance(user_submissions)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error analyzing performance: {str(e)}")
+
+@router.get("/users/{user_id}/insights")
+def get_user_performance_insights(user_id: str):
+    aggregate = user_aggregates.get(user_id)
+    if aggregate is None:
+        precomputed = precomputed_insights.get(user_id) if precomputed_insights is not None else None
+        if precomputed is None:
+            raise HTTPException(status_code=404, detail=f"No submissions found for user {user_id}")
+        return precomputed["insights"]
+    try:
+        # Served from the maintained per-user state, no rescan of the history
+        return aggregate.insights()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating insights: {str(e)}")
+
+@router.post("/submissions")
+def record_submission(submission: SubmissionData):
+    try:
+        # Fold the new submission into the user's aggregates and serve insights from that state
+        with user_state_lock:
+            aggregate = add_submission(submission, user_index, user_aggregates, score_percentiles)
+            live_submissions.append(submission)  # Only accepted submissions reach the replay log
+        if submission_store is not None:
+            submission_store.add_submissions([submission])
+        return {"user_id": submission.user_id, "insights": aggregate.insights()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error recording submission: {str(e)}")
+
+@router.get("/percentile")
+def get_score_percentile(score: float, quiz_id: Optional[int] = None, topic: Optional[str] = None):
+    if (quiz_id is None) == (topic is None):
+        raise HTTPException(status_code=422, detail="Pass exactly one of quiz_id or topic")
+    try:
+        # Percentile and rank of the score among everyone who took the quiz (or a quiz on the topic)
+        result = score_percentiles.percentile(score, quiz_id=quiz_id, topic=topic)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error computing percentile: {str(e)}")
+    if result is None:
+        cohort = f"quiz {quiz_id}" if quiz_id is not None else f"topic {topic}"
+        raise HTTPException(status_code=404, detail=f"No submissions found for {cohort}")
+    return {"score": score, "quiz_id": quiz_id, "topic": topic, **result}
+
+@router.get("/submissions/analysis")
+def get_stored_analysis(user_id: Optional[str] = None, quiz_id: Optional[int] = None, topic: Optional[str] = None):
+    if submission_store is None:
+        raise HTTPException(status_code=503, detail="No submission database configured")
+    try:
+        # Totals and per-topic sums are grouped in SQL over the indexed columns
+        return submission_store.analysis(user_id, quiz_id, topic)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error analyzing stored submissions: {str(e)}")
+
 @router.post("/predict-rank")
 def predict_student_rank(student_performance: SubmissionData):
     try:
-        # Train rank predictor model using historical submissions
-        theta = train_rank_predictor(historical_submissions)
+        # Fetch the rank predictor trained on historical submissions (refits only if the data changed)
+        snapshot = data_snapshots.current()
+        model = rank_models.model_for(snapshot.historical_submissions, snapshot.historical_fingerprint)
 
         # Extract relevant performance data
         features = [
@@ -55,20 +233,56 @@ def predict_student_rank(student_performance: SubmissionData):
             student_performance.mistakes_corrected,
             student_performance.final_score
         ]
-        print("Extracted features", features)
 
         # Predict rank for the new student
-        predicted_rank = predict_rank(features, theta)
-        return {"predicted_rank": predicted_rank}
+        predicted_rank = predict_rank(features, model.theta)
+        return {"predicted_rank": predicted_rank, "model_version": model.version}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error predicting rank: {str(e)}")
 
+@router.post("/predict-rank/batch")
+def predict_student_ranks(student_performances: List[SubmissionData]):
+    try:
+        snapshot = data_snapshots.current()
+        model = rank_models.model_for(snapshot.historical_submissions, snapshot.historical_fingerprint)
+
+        # Score every student with one matrix product, then look up all colleges at once
+        features, _ = rank_training_data(student_performances)
+        predicted_ranks = predict_rank_batch(features, model.theta)
+        predicted_colleges = predict_college_batch(predicted_ranks)
+        return {
+            "predicted_ranks": predicted_ranks.tolist(),
+            "predicted_colleges": predicted_colleges,
+            "model_version": model.version
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error predicting ranks: {str(e)}")
+
 @router.post("/predict-college")
-def predict_student_college(predicted_rank: dict):
+def predict_student_college(predicted_rank: CollegePredictionRequest):
     try:
         # Predict the college the student may attend based on predicted rank
-        rank = predicted_rank.get("predicted_rank")
-        predicted_college = predict_college(rank)
-        return {"predicted_college": predicted_college}
+        eligible = college_cutoffs.current().query(
+            predicted_rank.predicted_rank, category=predicted_rank.category, year=predicted_rank.year, quota=predicted_rank.quota
+        )
+        predicted_college = eligible[0].college if eligible else "No college found"
+        return {"predicted_college": predicted_college, "eligible_colleges": [asdict(cutoff) for cutoff in eligible]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error predicting college: {str(e)}")
+
+@router.post("/predict-college/batch")
+def predict_student_colleges(predicted_ranks: CollegeBatchPredictionRequest):
+    try:
+        # One index lookup per rank, sharing the category/year/quota filter
+        eligible = college_cutoffs.current().query_batch(
+            predicted_ranks.predicted_ranks,
+            category=predicted_ranks.category,
+            year=predicted_ranks.year,
+            quota=predicted_ranks.quota,
+        )
+        return {
+            "predicted_colleges": [matches[0].college if matches else "No college found" for matches in eligible],
+            "eligible_colleges": [[asdict(cutoff) for cutoff in matches] for matches in eligible],
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error predicting colleges: {str(e)}")
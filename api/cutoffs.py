@@ -0,0 +1,181 @@
+import csv
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from api.models import colleges
+from api.polling import PollingLoader, file_signature
+
+logger = logging.getLogger(__name__)
+
+CUTOFFS_PATH = os.path.join("data", "college_cutoffs.csv")
+CUTOFF_FIELDS = ("college", "category", "quota", "year", "opening_rank", "closing_rank")
+DEFAULT_CATEGORY = "GENERAL"
+RELOAD_INTERVAL = 2.0
+
+
+# One row of a cutoff table: the rank range a college admitted for a category, quota and year
+@dataclass(frozen=True)
+class Cutoff:
+    college: str
+    category: str
+    quota: str
+    year: int
+    opening_rank: int
+    closing_rank: int
+
+
+class IntervalTree:
+    """Static centered interval tree over rank ranges; a stabbing query costs O(log n + k)."""
+
+    def __init__(self, cutoffs: Sequence[Cutoff]):
+        self.cutoffs = list(cutoffs)
+        self.opening = np.array([cutoff.opening_rank for cutoff in self.cutoffs], dtype=float)
+        self.closing = np.array([cutoff.closing_rank for cutoff in self.cutoffs], dtype=float)
+        self._nodes: List[Tuple[float, np.ndarray, np.ndarray, int, int]] = []  # center, by opening, by closing desc, left, right
+        self._root = self._build(np.arange(len(self.cutoffs)))
+
+        # Non-overlapping ranges (the common single-category table) also allow a vectorized lookup
+        order = np.argsort(self.opening, kind="stable")
+        self._by_opening = order
+        self.disjoint = bool(np.all(self.opening[order][1:] > self.closing[order][:-1]))
+
+    def _build(self, members: np.ndarray) -> int:
+        if len(members) == 0:
+            return -1
+        center = float(np.median(np.concatenate([self.opening[members], self.closing[members]])))
+        left = members[self.closing[members] < center]
+        right = members[self.opening[members] > center]
+        here = members[(self.opening[members] <= center) & (self.closing[members] >= center)]
+        node = len(self._nodes)
+        self._nodes.append(None)
+        by_opening = here[np.argsort(self.opening[here], kind="stable")]
+        by_closing = here[np.argsort(-self.closing[here], kind="stable")]
+        self._nodes[node] = (center, by_opening, by_closing, self._build(left), self._build(right))
+        return node
+
+    def stab(self, rank: float) -> List[int]:
+        # Indices of every range containing rank; each node's scan stops at the first miss
+        found = []
+        node = self._root
+        while node >= 0:
+            center, by_opening, by_closing, left, right = self._nodes[node]
+            if rank < center:
+                for index in by_opening:
+                    if self.opening[index] > rank:
+                        break
+                    found.append(index)
+                node = left
+            elif rank > center:
+                for index in by_closing:
+                    if self.closing[index] < rank:
+                        break
+                    found.append(index)
+                node = right
+            else:
+                found.extend(by_opening)
+                break
+        return found
+
+    def stab_disjoint(self, ranks: np.ndarray) -> np.ndarray:
+        # For disjoint trees only: the single range holding each rank, or -1, by binary search over opening ranks
+        position = np.searchsorted(self.opening[self._by_opening], ranks, side="right") - 1
+        index = self._by_opening[np.clip(position, 0, None)]
+        return np.where((position >= 0) & (ranks <= self.closing[index]), index, -1)
+
+
+class CutoffIndex:
+    """Cutoff tables grouped by (category, quota, year), each group in its own interval tree."""
+
+    def __init__(self, cutoffs: Iterable[Cutoff]):
+        groups: Dict[Tuple[str, str, int], List[Cutoff]] = {}
+        for cutoff in cutoffs:
+            groups.setdefault((cutoff.category, cutoff.quota, cutoff.year), []).append(cutoff)
+        self._trees = {key: IntervalTree(rows) for key, rows in groups.items()}
+
+    def __len__(self) -> int:
+        return sum(len(tree.cutoffs) for tree in self._trees.values())
+
+    @classmethod
+    def from_csv(cls, path: str) -> "CutoffIndex":
+        with open(path, newline="") as file:
+            reader = csv.DictReader(file)
+            missing = set(CUTOFF_FIELDS) - set(reader.fieldnames or ())
+            if missing:
+                raise ValueError(f"{path} is missing columns: {', '.join(sorted(missing))}")
+            return cls(
+                Cutoff(row["college"], row["category"].strip().upper(), row["quota"].strip().upper(), int(row["year"]),
+                       int(row["opening_rank"]), int(row["closing_rank"]))
+                for row in reader
+            )
+
+    @classmethod
+    def from_colleges(cls, table: Dict[str, Dict[str, int]], year: int = 2024) -> "CutoffIndex":
+        # The built-in college table, used when no cutoff file is present
+        return cls(Cutoff(college, DEFAULT_CATEGORY, "AIQ", year, ranks["rank_lower"], ranks["rank_upper"]) for college, ranks in table.items())
+
+    def _matching(self, category: Optional[str], year: Optional[int], quota: Optional[str]) -> List[IntervalTree]:
+        # Category defaults to GENERAL and year to the latest one on file for that category (and quota, if given);
+        # quota is not filtered unless given
+        category = (category or DEFAULT_CATEGORY).upper()
+        quota = quota.upper() if quota else None
+        candidates = {key: tree for key, tree in self._trees.items()
+                      if key[0] == category and (quota is None or key[1] == quota)}
+        if year is None:
+            year = max((tree_year for _, _, tree_year in candidates), default=None)
+        return [tree for (_, _, tree_year), tree in candidates.items() if tree_year == year]
+
+    def query(self, rank: float, category: Optional[str] = None, year: Optional[int] = None, quota: Optional[str] = None) -> List[Cutoff]:
+        # Every eligible college, the one whose closing rank is nearest above the student's rank first
+        matches = [tree.cutoffs[index] for tree in self._matching(category, year, quota) for index in tree.stab(rank)]
+        return sorted(matches, key=lambda cutoff: (cutoff.closing_rank - rank, cutoff.college))
+
+    def query_batch(self, ranks: Iterable[float], category: Optional[str] = None, year: Optional[int] = None, quota: Optional[str] = None) -> List[List[Cutoff]]:
+        trees = self._matching(category, year, quota)
+        results = []
+        for rank in ranks:
+            matches = [tree.cutoffs[index] for tree in trees for index in tree.stab(rank)]
+            results.append(sorted(matches, key=lambda cutoff: (cutoff.closing_rank - rank, cutoff.college)))
+        return results
+
+    def best_batch(self, ranks, category: Optional[str] = None, year: Optional[int] = None, quota: Optional[str] = None) -> List[Optional[str]]:
+        ranks = np.asarray(ranks, dtype=float)
+        trees = self._matching(category, year, quota)
+        if len(trees) == 1 and trees[0].disjoint and len(trees[0].cutoffs):
+            # At most one range holds each rank, so the lookup vectorizes
+            names = np.array([cutoff.college for cutoff in trees[0].cutoffs] + [None], dtype=object)
+            return names[trees[0].stab_disjoint(ranks)].tolist()  # -1 picks the trailing None
+        return [matches[0].college if matches else None for matches in self.query_batch(ranks, category, year, quota)]
+
+
+class CutoffLoader(PollingLoader):
+    """Holds the current CutoffIndex and rebuilds it when the cutoff file changes."""
+
+    thread_name = "cutoff-loader"
+    reload_error = "Failed to reload college cutoffs"
+
+    def __init__(self, path: str = CUTOFFS_PATH, interval: float = RELOAD_INTERVAL):
+        super().__init__(interval)
+        self.path = path
+        self._index: Optional[CutoffIndex] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def current(self) -> CutoffIndex:
+        return self._index
+
+    def refresh(self) -> bool:
+        with self._lock:
+            signature = file_signature(self.path)
+            if self._index is not None and signature == self._signature:
+                return False
+            index = CutoffIndex.from_csv(self.path) if signature is not None else CutoffIndex.from_colleges(colleges)
+            self._index, self._signature = index, signature
+        logger.info("Loaded %d college cutoffs from %s", len(index), self.path if signature is not None else "the built-in table")
+        return True
+
+
+college_cutoffs = CutoffLoader()
@@ -0,0 +1,199 @@
+import argparse
+import json
+import logging
+import sys
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, List, Optional, TextIO, Tuple, Union
+import numpy as np
+from pydantic import ValidationError
+from api.models import SubmissionData
+from api.polling import file_signature
+from api.records import SourceSpan, SubmissionRecord
+from api.service import StreamingAnalysis, generate_insights
+from api.training import IncrementalRankTrainer
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1000
+READ_SIZE = 1 << 16
+
+
+# A record that could not be parsed or validated; position is a line number (NDJSON) or array index
+@dataclass(frozen=True)
+class IngestError:
+    position: int
+    message: str
+
+
+@dataclass
+class IngestResult:
+    analysis: dict
+    theta: np.ndarray
+    records: int = 0
+    errors: List[IngestError] = field(default_factory=list)
+
+
+def _log_error(error: IngestError):
+    logger.warning("Skipping record %s: %s", error.position, error.message)
+
+
+def _byte_length(text: str) -> int:
+    return len(text) if text.isascii() else len(text.encode("utf-8"))
+
+
+def _iter_ndjson(file: TextIO, on_error: Callable[[IngestError], None]) -> Iterator[Tuple[int, Any, str, int]]:
+    offset = 0
+    for line_number, line in enumerate(file, start=1):
+        line_offset, offset = offset, offset + _byte_length(line)
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line), line, line_offset
+        except json.JSONDecodeError as e:
+            on_error(IngestError(line_number, f"Invalid JSON: {e}"))
+
+
+def _iter_json_array(file: TextIO) -> Iterator[Tuple[int, Any, str, int]]:
+    # Decode one element at a time from a sliding buffer instead of loading the whole array.
+    # byte_position tracks the file offset of buffer[position] across refills.
+    decoder = json.JSONDecoder()
+    buffer, position, byte_position, eof = "", 0, 0, False
+
+    def fill(size: int = READ_SIZE) -> bool:
+        nonlocal buffer, position, eof
+        data = file.read(size)
+        buffer = buffer[position:] + data
+        position = 0
+        eof = not data
+        return bool(data)
+
+    def next_token() -> str:
+        nonlocal position, byte_position
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                byte_position += _byte_length(buffer[position])
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if not fill():
+                raise ValueError("Unexpected end of JSON array")
+
+    if next_token() != "[":
+        raise ValueError("Expected a JSON array")
+    position += 1
+    byte_position += 1
+    if next_token() == "]":
+        return
+
+    index = 0
+    read_size = READ_SIZE
+    while True:
+        next_token()
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+            # A value touching the end of the buffer may be truncated (e.g. a number), so read more first
+            complete = end < len(buffer) or eof
+        except json.JSONDecodeError as e:
+            if eof:
+                raise ValueError(f"Invalid JSON in array element {index}: {e}") from e
+            complete = False
+        if not complete:
+            fill(read_size)
+            read_size *= 2  # Large records need geometrically larger reads to stay linear
+            continue
+        read_size = READ_SIZE
+        text = buffer[position:end]
+        yield index, value, text, byte_position
+        index += 1
+        position = end
+        byte_position += _byte_length(text)
+
+        separator = next_token()
+        position += 1
+        byte_position += 1
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError(f"Expected ',' or ']' after array element {index - 1}")
+
+
+def iter_records(path: str, on_error: Optional[Callable[[IngestError], None]] = None) -> Iterator[Tuple[int, Any, str, int]]:
+    # Yields (position, parsed value, raw JSON text, byte offset of that text); a file starting with '['
+    # is read as a JSON array, anything else as NDJSON. Newlines are left untranslated so offsets stay exact.
+    on_error = on_error or _log_error
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        head = file.read(1)
+        while head and head.isspace():
+            head = file.read(1)
+        file.seek(0)
+        if head == "[":
+            yield from _iter_json_array(file)
+        else:
+            yield from _iter_ndjson(file, on_error)
+
+
+def iter_submission_chunks(path: str, chunk_size: int = CHUNK_SIZE,
+                           on_error: Optional[Callable[[IngestError], None]] = None,
+                           trusted: bool = False) -> Iterator[List[Union[SubmissionData, SubmissionRecord]]]:
+    # Yields submissions in lists of at most chunk_size; invalid records go to on_error.
+    # Trusted mode skips model validation and yields compact SubmissionRecords that remember only
+    # where their JSON sits in the file, and re-read it if they are materialized.
+    on_error = on_error or _log_error
+    signature = file_signature(path)
+    chunk: List[Union[SubmissionData, SubmissionRecord]] = []
+    for position, record, text, offset in iter_records(path, on_error):
+        try:
+            if trusted:
+                chunk.append(SubmissionRecord.from_dict(record, source=SourceSpan(path, offset, _byte_length(text), signature)))
+            else:
+                chunk.append(SubmissionData(**record))
+        except (ValidationError, TypeError, KeyError, ValueError, AttributeError) as e:
+            on_error(IngestError(position, str(e)))
+            continue
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def ingest_submissions(path: str, chunk_size: int = CHUNK_SIZE, trusted: bool = False) -> IngestResult:
+    # One pass over the file feeds every chunk into both the analysis and the rank model statistics
+    errors: List[IngestError] = []
+
+    def on_error(error: IngestError):
+        _log_error(error)
+        errors.append(error)
+
+    analysis = StreamingAnalysis()
+    trainer = IncrementalRankTrainer()
+    records = 0
+    for chunk in iter_submission_chunks(path, chunk_size, on_error, trusted):
+        analysis.add(chunk)
+        trainer.partial_fit(chunk)
+        records += len(chunk)
+
+    theta = trainer.theta() if records else np.zeros(0)
+    return IngestResult(analysis=analysis.result(), theta=theta, records=records, errors=errors)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Stream a historical submissions file (NDJSON or JSON array) into analysis and rank training.")
+    parser.add_argument("path")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--trusted", action="store_true", help="Skip model validation for data that was already validated")
+    args = parser.parse_args(argv)
+
+    result = ingest_submissions(args.path, args.chunk_size, args.trusted)
+    json.dump({
+        "records": result.records,
+        "errors": len(result.errors),
+        "insights": generate_insights(result.analysis) if result.records else None,
+        "theta": result.theta.tolist(),
+    }, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main()
@@ -0,0 +1,119 @@
+import json
+import mmap
+import os
+import struct
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+import numpy as np
+
+INSIGHTS_PATH = os.path.join("data", "user_insights.bin")
+
+# Layout: header | JSON blobs | user ids | index (one fixed-size entry per user, sorted by user id)
+MAGIC = b"RPINSGT1"
+HEADER = struct.Struct("<8sQQQ")  # magic, entry count, offset of the user ids, offset of the index
+INDEX_DTYPE = np.dtype([("key_offset", "<u8"), ("key_length", "<u4"), ("blob_offset", "<u8"), ("blob_length", "<u4")])
+
+
+class InsightsWriter:
+    """Writes per-user results into the insights file format; entries must arrive in user id order."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._temporary = f"{path}.tmp"
+        self._file: BinaryIO = open(self._temporary, "wb")
+        self._file.write(HEADER.pack(MAGIC, 0, 0, 0))  # Rewritten on close
+        self._keys: List[bytes] = []
+        self._blobs: List[Tuple[int, int]] = []
+        self._last: Optional[bytes] = None
+
+    def add(self, user_id: str, blob: bytes):
+        key = user_id.encode("utf-8")
+        if self._last is not None and key <= self._last:
+            raise ValueError(f"User ids must be unique and sorted; got {user_id!r} after {self._last.decode('utf-8')!r}")
+        self._blobs.append((self._file.tell(), len(blob)))
+        self._file.write(blob)
+        self._keys.append(key)
+        self._last = key
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def close(self):
+        # Keys and the index go after the blobs, so blobs stream straight to disk
+        index = np.zeros(len(self._keys), dtype=INDEX_DTYPE)
+        keys_offset = self._file.tell()
+        position = keys_offset
+        for entry, (key, (blob_offset, blob_length)) in enumerate(zip(self._keys, self._blobs)):
+            index[entry] = (position, len(key), blob_offset, blob_length)
+            self._file.write(key)
+            position += len(key)
+        index_offset = self._file.tell()
+        self._file.write(index.tobytes())
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, len(self._keys), keys_offset, index_offset))
+        self._file.close()
+        os.replace(self._temporary, self.path)  # Readers never see a half-written file
+
+    def __enter__(self) -> "InsightsWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            os.remove(self._temporary)
+
+
+class InsightsFile:
+    """Memory-mapped reader; a lookup is a binary search over the index, decoding only the matching blob."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count, self._keys_offset, index_offset = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an insights file")
+        self._index = np.frombuffer(self._map, dtype=INDEX_DTYPE, count=self._count, offset=index_offset)
+
+    def _key(self, entry: int) -> bytes:
+        offset, length = int(self._index["key_offset"][entry]), int(self._index["key_length"][entry])
+        return self._map[offset:offset + length]
+
+    def _find(self, user_id: str) -> int:
+        key = user_id.encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low if low < self._count and self._key(low) == key else -1
+
+    def blob(self, user_id: str) -> Optional[bytes]:
+        entry = self._find(user_id)
+        if entry < 0:
+            return None
+        offset, length = int(self._index["blob_offset"][entry]), int(self._index["blob_length"][entry])
+        return self._map[offset:offset + length]
+
+    def get(self, user_id: str) -> Optional[dict]:
+        blob = self.blob(user_id)
+        return json.loads(blob) if blob is not None else None
+
+    def items(self) -> Iterator[Tuple[str, bytes]]:
+        # (user_id, raw blob) in user id order
+        for entry in range(self._count):
+            offset, length = int(self._index["blob_offset"][entry]), int(self._index["blob_length"][entry])
+            yield self._key(entry).decode("utf-8"), self._map[offset:offset + length]
+
+    def __contains__(self, user_id: str) -> bool:
+        return self._find(user_id) >= 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self):
+        self._index = None
+        self._map.close()
@@ -1,12 +1,12 @@
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.requests import Request
-from api.controller import router  # Import the controller module
-from api.service import analyze_performance, generate_insights, visualize_performance
-from api.utils import json_files
-from api.models import SubmissionData
+from api.controller import router, chart_cache, data_snapshots, response_cache  # Import the controller module
+from api.service import analyze_columns, generate_insights
+from api.metrics import PROFILE_HEADER, REQUEST_SECONDS, REQUESTS, SamplingProfiler, metrics, profiles, profiling_requested
 import json
+import time
 
 app = FastAPI()
 templates = Jinja2Templates(directory=".")
@@ -14,21 +14,60 @@ templates = Jinja2Templates(directory=".")
 # Include the router with the controller's endpoints
 app.include_router(router)
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    # Opt-in per request: a sampling profile of every thread while this request runs
+    profiler = None
+    if profiling_requested(request.headers.get(PROFILE_HEADER)):
+        profiler = SamplingProfiler()
+        profiler.start()
+
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - start
+        # Label by route template so path parameters don't explode the series count
+        route = request.scope.get("route")
+        route_path = route.path if route is not None else "unmatched"
+        REQUEST_SECONDS.observe(elapsed, method=request.method, route=route_path, status=status)
+        REQUESTS.inc(method=request.method, route=route_path, status=status)
+        if profiler is not None:
+            profiler.stop()
+
+    if profiler is not None:
+        response.headers["X-Profile-Id"] = profiles.add(profiler.collapsed())
+    return response
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/debug/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: str, request: Request):
+    # Collapsed stacks, ready for flamegraph.pl or speedscope; readable only with the profiling token
+    profile = profiles.get(profile_id) if profiling_requested(request.headers.get(PROFILE_HEADER)) else None
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Profile not found: {profile_id}")
+    return PlainTextResponse(profile)
+
 @app.get("/", response_class=HTMLResponse)
 async def read_index(request: Request):
-    # Load data for current quiz, historical data, and submission data
-    current_quiz_data, historical_data, submission_data = json_files("current_quiz_data", "historical_data", "submission_data")
-
-    # Convert historical data to list of SubmissionData objects
-    historical_submissions = [SubmissionData(**data) for data in historical_data]
-
-    # Analyze user performance based on historical submissions
-    analysis_data = analyze_performance(historical_submissions)
-    insights = generate_insights(analysis_data)
-    visualize_performance(analysis_data)  # Call the visualization function here
-    
-    # Convert analysis data and insights to JSON strings and escape them
-    analysis_data_json = json.dumps(analysis_data).replace("</", "<\\/")
-    insights_json = json.dumps(insights).replace("</", "<\\/")
-
-    return templates.TemplateResponse("index.html", {"request": request, "analysis_data": analysis_data_json, "insights": insights_json})
\ No newline at end of file
+    # The rendered page only changes with the data, so it is built once per snapshot version
+    snapshot = data_snapshots.current()
+
+    def render_index() -> bytes:
+        # Analyze user performance based on the historical submissions of the current data snapshot
+        analysis_data = analyze_columns(snapshot.historical_columns)
+        insights = generate_insights(analysis_data)
+        chart_cache.request(analysis_data)  # Rendered in the background, served from /charts
+
+        # Convert analysis data and insights to JSON strings and escape them
+        analysis_data_json = json.dumps(analysis_data).replace("</", "<\\/")
+        insights_json = json.dumps(insights).replace("</", "<\\/")
+        page = templates.get_template("index.html").render(request=request, analysis_data=analysis_data_json, insights=insights_json)
+        return page.encode("utf-8")
+
+    return response_cache.respond(request, "index", snapshot.version, snapshot.modified_at, render_index, media_type="text/html; charset=utf-8")
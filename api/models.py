@@ -122,6 +122,19 @@ class SubmissionData(SQLModel):
 class NextStep(SQLModel):
     pageType: str  
 
+# Request bodies for college prediction; category defaults to GENERAL and year to the latest one on file
+class CollegePredictionRequest(SQLModel):
+    predicted_rank: float
+    year: Optional[int] = None
+    category: Optional[str] = None
+    quota: Optional[str] = None
+
+class CollegeBatchPredictionRequest(SQLModel):
+    predicted_ranks: List[float]
+    year: Optional[int] = None
+    category: Optional[str] = None
+    quota: Optional[str] = None
+
 # a simple college dataset with NEET rank ranges
 colleges = {
     "College A": {"rank_lower": 1, "rank_upper": 1000},
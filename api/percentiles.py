@@ -0,0 +1,199 @@
+import bisect
+import heapq
+import itertools
+import math
+import random
+import threading
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+from api.models import SubmissionData
+
+# Cohorts up to this size keep every score; larger ones switch to a KLL sketch
+EXACT_LIMIT = 2000
+SKETCH_K = 200
+
+
+class ExactScores:
+    """Every score of a small cohort in one sorted list."""
+
+    def __init__(self, values: Iterable[float] = ()):
+        self.values: List[float] = sorted(float(value) for value in values)
+
+    @property
+    def n(self) -> int:
+        return len(self.values)
+
+    def add(self, value: float):
+        bisect.insort(self.values, float(value))
+
+    def merge(self, other: "ExactScores"):
+        self.values = list(heapq.merge(self.values, other.values))
+
+    def count_below(self, value: float) -> Tuple[float, float]:
+        # Scores strictly below value, and scores at or below it
+        return bisect.bisect_left(self.values, value), bisect.bisect_right(self.values, value)
+
+
+class KLLSketch:
+    """KLL quantile sketch: compactor levels whose items weigh 2 ** level.
+
+    Holds about 3 * k items however long the stream gets; rank estimates are within
+    roughly 1.7 / k of the cohort size with high probability.
+    """
+
+    def __init__(self, k: int = SKETCH_K, seed: int = 0):
+        self.k = k
+        self.n = 0
+        self.levels: List[List[float]] = [[]]
+        self._size = 0
+        self._max_size = self._capacity(0)
+        self._random = random.Random(seed)
+        self._cdf: Optional[Tuple[List[float], List[int]]] = None  # Sorted values and cumulative weights
+
+    def _capacity(self, level: int) -> int:
+        # Levels below the top shrink geometrically, so most of the memory goes to the heaviest items
+        depth = len(self.levels) - level - 1
+        return max(2, math.ceil(self.k * (2 / 3) ** depth))
+
+    def add(self, value: float):
+        self.levels[0].append(float(value))
+        self.n += 1
+        self._size += 1
+        self._cdf = None
+        if self._size > self._max_size:
+            self._compress()
+
+    def merge(self, other: "KLLSketch"):
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self.n += other.n
+        self._size += other._size
+        self._max_size = sum(self._capacity(level) for level in range(len(self.levels)))
+        self._cdf = None
+        self._compress()
+
+    def _compress(self):
+        # Lazy compaction: only once the sketch as a whole is over budget, halve the lowest full level
+        # (sort it, promote every other item from a random offset)
+        while self._size > self._max_size:
+            for level, items in enumerate(self.levels):
+                if len(items) >= self._capacity(level):
+                    if level + 1 == len(self.levels):
+                        self.levels.append([])
+                        self._max_size = sum(self._capacity(level) for level in range(len(self.levels)))
+                    items.sort()
+                    kept = [items.pop()] if len(items) % 2 else []  # An odd item stays behind at its weight
+                    promoted = items[self._random.randint(0, 1)::2]
+                    self.levels[level + 1].extend(promoted)
+                    self.levels[level] = kept
+                    self._size -= len(items) - len(promoted)
+                    break
+
+    def count_below(self, value: float) -> Tuple[float, float]:
+        if self._cdf is None:
+            weighted = sorted((item, 1 << level) for level, items in enumerate(self.levels) for item in items)
+            self._cdf = ([item for item, _ in weighted], list(itertools.accumulate(weight for _, weight in weighted)))
+        values, cumulative = self._cdf
+        below = bisect.bisect_left(values, value)
+        at_or_below = bisect.bisect_right(values, value)
+        return (cumulative[below - 1] if below else 0), (cumulative[at_or_below - 1] if at_or_below else 0)
+
+
+class CohortScores:
+    """Scores of one cohort: exact while small, a KLL sketch once it outgrows exact_limit."""
+
+    def __init__(self, exact_limit: int = EXACT_LIMIT, k: int = SKETCH_K):
+        self.exact_limit = exact_limit
+        self.k = k
+        self.scores = ExactScores()
+
+    @property
+    def n(self) -> int:
+        return self.scores.n
+
+    @property
+    def exact(self) -> bool:
+        return isinstance(self.scores, ExactScores)
+
+    def add(self, value: float):
+        self.scores.add(value)
+        self._maybe_sketch()
+
+    def merge(self, other: "CohortScores"):
+        if self.exact and other.exact:
+            self.scores.merge(other.scores)
+        else:
+            self._to_sketch()
+            if other.exact:
+                for value in other.scores.values:
+                    self.scores.add(value)
+            else:
+                self.scores.merge(other.scores)
+        self._maybe_sketch()
+
+    def _maybe_sketch(self):
+        if self.exact and self.scores.n > self.exact_limit:
+            self._to_sketch()
+
+    def _to_sketch(self):
+        if self.exact:
+            sketch = KLLSketch(self.k)
+            for value in self.scores.values:
+                sketch.add(value)
+            self.scores = sketch
+
+    def percentile(self, value: float) -> Dict[str, object]:
+        # Ties count half, so the middle of a block of equal scores sits at its midpoint
+        below, at_or_below = self.scores.count_below(value)
+        n = self.scores.n
+        return {
+            "percentile": 100 * (below + at_or_below) / (2 * n) if n else None,
+            "estimated_rank": n - at_or_below + 1,  # One more than the number of strictly higher scores
+            "cohort_size": n,
+            "exact": self.exact,
+        }
+
+
+class PercentileEngine:
+    """Final-score distributions per quiz and per topic, updated as submissions arrive."""
+
+    def __init__(self, exact_limit: int = EXACT_LIMIT, k: int = SKETCH_K):
+        self.exact_limit = exact_limit
+        self.k = k
+        self._cohorts: Dict[Tuple[str, Hashable], CohortScores] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_submissions(cls, submissions: Iterable[SubmissionData], exact_limit: int = EXACT_LIMIT, k: int = SKETCH_K) -> "PercentileEngine":
+        engine = cls(exact_limit, k)
+        for submission in submissions:
+            engine.add(submission)
+        return engine
+
+    def _cohort(self, key: Tuple[str, Hashable]) -> CohortScores:
+        cohort = self._cohorts.get(key)
+        if cohort is None:
+            cohort = self._cohorts[key] = CohortScores(self.exact_limit, self.k)
+        return cohort
+
+    def add(self, submission: SubmissionData):
+        with self._lock:
+            self._cohort(("quiz", submission.quiz_id)).add(submission.final_score)
+            if submission.quiz.topic:
+                self._cohort(("topic", submission.quiz.topic)).add(submission.final_score)
+
+    def merge(self, other: "PercentileEngine"):
+        # Combine engines built over separate shards of the data
+        with self._lock:
+            for key, cohort in other._cohorts.items():
+                self._cohort(key).merge(cohort)
+
+    def percentile(self, score: float, quiz_id: Optional[int] = None, topic: Optional[str] = None) -> Optional[Dict[str, object]]:
+        key = ("quiz", quiz_id) if quiz_id is not None else ("topic", topic)
+        with self._lock:
+            cohort = self._cohorts.get(key)
+            return cohort.percentile(score) if cohort is not None else None
+
+    def __len__(self) -> int:
+        return len(self._cohorts)
@@ -0,0 +1,55 @@
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def file_signature(path: str) -> Optional[Tuple[int, int]]:
+    # (mtime, size) is enough to notice a rewrite without reading the file; None when it is missing
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class PollingLoader(ABC):
+    """Calls refresh() from a daemon thread every interval seconds until stopped.
+
+    Subclasses implement refresh(), which decides from file signatures whether anything changed.
+    """
+
+    thread_name = "polling-loader"
+    reload_error = "Failed to reload"
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @abstractmethod
+    def refresh(self) -> bool:
+        """Reload if the watched files changed; returns whether anything was swapped in."""
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._watch, name=self.thread_name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception:
+                # Keep the last good state if a file is mid-write or malformed
+                logger.exception(self.reload_error)
@@ -0,0 +1,80 @@
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple, Union
+from api.models import SubmissionData
+from api.polling import file_signature
+
+
+# Where a record's raw JSON sits in its file, so trusted records need not hold the text itself
+@dataclass(frozen=True, slots=True)
+class SourceSpan:
+    path: str
+    offset: int  # In bytes
+    length: int
+    signature: Optional[Tuple[int, int]]  # The file's (mtime, size) when it was read
+
+    def read(self) -> bytes:
+        if file_signature(self.path) != self.signature:
+            raise ValueError(f"{self.path} changed since it was loaded; its records can no longer be materialized")
+        with open(self.path, "rb") as file:
+            file.seek(self.offset)
+            return file.read(self.length)
+
+
+class QuizRef:
+    """The part of a Quiz the analysis reads."""
+
+    __slots__ = ("id", "topic")
+
+    def __init__(self, id: Optional[int], topic: str):
+        self.id = id
+        self.topic = topic
+
+
+class SubmissionRecord:
+    """Compact submission for trusted, already-validated data.
+
+    Holds only the fields used by the analysis, aggregates and rank training, and exposes
+    them under the same names as SubmissionData so either can be passed to those paths.
+    The full model is built only when materialize() is called, from the record's JSON
+    re-read out of its source file (or from the text or dict it was created with).
+    """
+
+    __slots__ = (
+        "id", "quiz_id", "user_id", "submitted_at", "score", "accuracy", "final_score", "negative_score",
+        "better_than", "mistakes_corrected", "correct_answers", "incorrect_answers", "total_questions",
+        "quiz", "_source",
+    )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], source: Union[SourceSpan, str, Dict[str, Any], None] = None) -> "SubmissionRecord":
+        # Plain conversions only; the same coercions pydantic applies to these fields for trusted input
+        record = cls.__new__(cls)
+        record.id = data.get("id")
+        record.quiz_id = int(data["quiz_id"])
+        record.user_id = data["user_id"]
+        record.submitted_at = datetime.fromisoformat(data["submitted_at"])
+        record.score = int(data["score"])
+        record.accuracy = SubmissionData.parse_accuracy(data["accuracy"])
+        record.final_score = float(data["final_score"])
+        record.negative_score = float(data["negative_score"])
+        record.better_than = int(data["better_than"])
+        record.mistakes_corrected = int(data["mistakes_corrected"])
+        record.correct_answers = int(data["correct_answers"])
+        record.incorrect_answers = int(data["incorrect_answers"])
+        record.total_questions = int(data["total_questions"])
+        quiz = data["quiz"]
+        record.quiz = QuizRef(quiz.get("id"), quiz["topic"])
+        record._source = source
+        return record
+
+    def materialize(self) -> SubmissionData:
+        # Full validation of the nested Quiz/Question/Option tree, on demand
+        if self._source is None:
+            raise ValueError(f"Submission {self.id} was loaded without its source and cannot be materialized")
+        if isinstance(self._source, SourceSpan):
+            data = json.loads(self._source.read())
+        else:
+            data = json.loads(self._source) if isinstance(self._source, str) else self._source
+        return SubmissionData(**data)
@@ -0,0 +1,107 @@
+import hashlib
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Optional
+import numpy as np
+from api.utils import rank_training_data, train_rank_predictor
+
+# A fitted rank model together with the dataset it was trained on
+@dataclass(frozen=True)
+class RankModel:
+    version: int
+    fingerprint: str
+    theta: np.ndarray
+    n_samples: int
+    trained_at: datetime
+
+
+def dataset_fingerprint(data) -> str:
+    # Content hash of exactly what the trainer sees, so unrelated field changes don't force a refit
+    X, y = rank_training_data(data)
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(X, dtype=np.float64).tobytes())
+    digest.update(np.ascontiguousarray(y, dtype=np.int64).tobytes())
+    return digest.hexdigest()
+
+
+class RankModelRegistry:
+    """Fits the rank predictor once per distinct historical dataset and serves the cached theta."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.current: Optional[RankModel] = None
+        self.versions: Dict[int, RankModel] = {}
+        self._by_fingerprint: Dict[str, RankModel] = {}
+        self._next_version = 1
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+
+    def model_for(self, data, fingerprint: Optional[str] = None) -> RankModel:
+        # Callers that already know the dataset hash skip rebuilding the feature matrix
+        current = self.current
+        if current is not None and fingerprint is not None and current.fingerprint == fingerprint:
+            return current
+
+        if fingerprint is None:
+            fingerprint = dataset_fingerprint(data)
+
+        with self._lock:
+            model = self._by_fingerprint.get(fingerprint)
+            if model is None:
+                model = self._register(fingerprint, train_rank_predictor(data), len(data))
+                self._save(model)
+            self.current = model
+            return model
+
+    def _register(self, fingerprint: str, theta, n_samples: int, version: Optional[int] = None,
+                  trained_at: Optional[datetime] = None) -> RankModel:
+        version = version or self._next_version
+        model = RankModel(
+            version=version,
+            fingerprint=fingerprint,
+            theta=np.asarray(theta, dtype=np.float64),
+            n_samples=n_samples,
+            trained_at=trained_at or datetime.now(timezone.utc),
+        )
+        self.versions[version] = model
+        self._by_fingerprint[fingerprint] = model
+        self._next_version = max(self._next_version, version + 1)
+        return model
+
+    def _load(self):
+        # A persisted model lets a cold start skip the solve when the data is unchanged
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as stored:
+                model = self._register(
+                    str(stored["fingerprint"]),
+                    stored["theta"],
+                    int(stored["n_samples"]),
+                    version=int(stored["version"]),
+                    trained_at=datetime.fromisoformat(str(stored["trained_at"])),
+                )
+        except (OSError, KeyError, ValueError):
+            return
+        self.current = model
+
+    def _save(self, model: RankModel):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as file:
+            np.savez(
+                file,
+                theta=model.theta,
+                fingerprint=model.fingerprint,
+                version=model.version,
+                n_samples=model.n_samples,
+                trained_at=model.trained_at.isoformat(),
+            )
+        os.replace(tmp_path, self.path)
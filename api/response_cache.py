@@ -0,0 +1,126 @@
+import gzip
+import json
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, Dict, Optional
+from fastapi import Request, Response
+from api.metrics import metrics
+
+GZIP_LEVEL = 6
+MIN_GZIP_BYTES = 512  # Smaller bodies are served as-is
+CACHE_CONTROL = "no-cache"  # Always revalidate: the data can be reloaded at any time
+
+RESPONSE_CACHE = metrics.counter("response_cache_total", "Cached response lookups by endpoint and outcome.", ("endpoint", "outcome"))
+
+
+# A serialized response body for one data version, with its validators and a gzipped copy
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    gzipped: Optional[bytes]
+    media_type: str
+    etag: str
+    modified_at: datetime
+
+    def headers(self) -> Dict[str, str]:
+        return _validator_headers(self.etag, self.modified_at)
+
+
+def json_body(content) -> bytes:
+    # The encoding FastAPI's JSONResponse uses, so cached bodies match uncached ones byte for byte
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def response_etag(name: str, version: str) -> str:
+    # Weak: the gzip and identity encodings of one version share it
+    return f'W/"{version}-{name}"'
+
+
+def _validator_headers(etag: str, modified_at: datetime) -> Dict[str, str]:
+    last_modified = format_datetime(modified_at, usegmt=True)
+    return {"ETag": etag, "Last-Modified": last_modified, "Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding"}
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # Weak comparison, as If-None-Match requires; the header may list several tags or be "*"
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in tags)
+
+
+def _not_modified_since(header: str, modified_at: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    # HTTP dates have one-second resolution
+    return since.tzinfo is not None and modified_at.replace(microsecond=0) <= since
+
+
+def _accepts_gzip(header: str) -> bool:
+    # gzip (or *) listed without q=0
+    for coding in header.split(","):
+        name, *params = [part.strip() for part in coding.split(";")]
+        if name.lower() not in ("gzip", "*"):
+            continue
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+class ResponseCache:
+    """Serialized endpoint responses for the current data version; a new version drops every entry."""
+
+    def __init__(self):
+        self._version: Optional[str] = None
+        self._entries: Dict[str, CachedResponse] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, version: str, modified_at: datetime, build: Callable[[], bytes], media_type: str) -> CachedResponse:
+        with self._lock:
+            if version != self._version:
+                self._version, self._entries = version, {}
+            cached = self._entries.get(name)
+        if cached is not None:
+            RESPONSE_CACHE.inc(endpoint=name, outcome="hit")
+            return cached
+
+        # Built outside the lock; concurrent misses for one version produce identical bytes
+        RESPONSE_CACHE.inc(endpoint=name, outcome="miss")
+        body = build()
+        cached = CachedResponse(
+            body=body,
+            gzipped=gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0) if len(body) >= MIN_GZIP_BYTES else None,
+            media_type=media_type,
+            etag=response_etag(name, version),
+            modified_at=modified_at,
+        )
+        with self._lock:
+            if version == self._version:
+                self._entries[name] = cached
+        return cached
+
+    def respond(self, request: Request, name: str, version: str, modified_at: datetime, build: Callable[[], bytes], media_type: str = "application/json") -> Response:
+        # Validators come from the data version alone, so a revalidation never builds or reads a body.
+        # If-None-Match takes precedence over If-Modified-Since when both are sent.
+        etag = response_etag(name, version)
+        if_none_match = request.headers.get("if-none-match")
+        if_modified_since = request.headers.get("if-modified-since")
+        if (_etag_matches(if_none_match, etag) if if_none_match is not None
+                else if_modified_since is not None and _not_modified_since(if_modified_since, modified_at)):
+            RESPONSE_CACHE.inc(endpoint=name, outcome="not_modified")
+            return Response(status_code=304, headers=_validator_headers(etag, modified_at))
+
+        cached = self.get(name, version, modified_at, build, media_type)
+        headers = cached.headers()
+        if cached.gzipped is not None and _accepts_gzip(request.headers.get("accept-encoding", "")):
+            headers["Content-Encoding"] = "gzip"
+            return Response(cached.gzipped, media_type=cached.media_type, headers=headers)
+        return Response(cached.body, media_type=cached.media_type, headers=headers)
@@ -1,10 +1,15 @@
-from api.models import SubmissionData, colleges
+from api.models import SubmissionData
+from api.cutoffs import college_cutoffs
+from api.columnar import SubmissionColumns, epoch_micros
+from api.answer_key import AnswerKey
+from api.metrics import timed_stage
 from typing import List
 import numpy as np
 import matplotlib.pyplot as plt
 import os
 
 # Function for analyzing student performance
+@timed_stage("analyze_performance")
 def analyze_performance(user_data: List[SubmissionData]):
     # Initialize variables for tracking performance
     total_accuracy = 0
@@ -40,8 +45,11 @@ def analyze_performance(user_data: List[SubmissionData]):
             topic_performance[topic]['mistakes'] += submission.incorrect_answers
         
         # Track accuracy trends over time
-        accuracy_trends.append(accuracy_numeric)
-    
+        accuracy_trends.append((epoch_micros(submission.submitted_at), accuracy_numeric))
+
+    # Order the trend by submission time rather than list order (the sort is stable; naive times count as UTC)
+    accuracy_trends.sort(key=lambda entry: entry[0])
+
     return {
         'total_accuracy': total_accuracy,
         'total_score': total_score,
@@ -51,10 +59,117 @@ def analyze_performance(user_data: List[SubmissionData]):
         'total_mistakes_corrected': total_mistakes_corrected,
         'total_quizzes': total_quizzes,
         'topic_performance': topic_performance,
-        'accuracy_trends': accuracy_trends
+        'accuracy_trends': [accuracy for _, accuracy in accuracy_trends]
+    }
+
+# Running left-to-right total so float sums match the row-wise loop bit for bit
+def _sequential_sum(values):
+    return np.cumsum(values)[-1].item() if len(values) else 0
+
+# Vectorized analysis over columnar submissions, same output as analyze_performance
+@timed_stage("analyze_performance")
+def analyze_columns(columns: SubmissionColumns):
+    topic_performance = {}
+    has_topic = columns.topic_codes >= 0
+    if has_topic.any():
+        codes = columns.topic_codes[has_topic]
+        size = len(columns.topics)
+        counts = np.bincount(codes, minlength=size)
+        correct = np.bincount(codes, weights=columns.correct_answers[has_topic], minlength=size)
+        total = np.bincount(codes, weights=columns.total_questions[has_topic], minlength=size)
+        mistakes = np.bincount(codes, weights=columns.incorrect_answers[has_topic], minlength=size)
+        for code in np.flatnonzero(counts):
+            topic_performance[columns.topics[code]] = {
+                'correct': int(correct[code]),
+                'total': int(total[code]),
+                'mistakes': int(mistakes[code])
+            }
+
+    return {
+        'total_accuracy': _sequential_sum(columns.accuracy),
+        'total_score': int(columns.score.sum()),
+        'total_final_score': _sequential_sum(columns.final_score),
+        'total_negative_score': _sequential_sum(columns.negative_score),
+        'total_rank': int(columns.better_than.sum()),
+        'total_mistakes_corrected': int(columns.mistakes_corrected.sum()),
+        'total_quizzes': len(columns),
+        'topic_performance': topic_performance,
+        'accuracy_trends': columns.accuracy[np.argsort(columns.submitted_at, kind='stable')].tolist()
+    }
+
+# Folds chunks of submissions into one analysis without keeping the submissions around
+class StreamingAnalysis:
+    def __init__(self):
+        self.analysis = analyze_performance([])
+        self._timestamps = []
+        self._accuracies = []
+
+    def add(self, submissions):
+        columns = SubmissionColumns.from_submissions(submissions)
+        partial = analyze_columns(columns)
+        for key, value in partial.items():
+            if key.startswith('total_'):
+                self.analysis[key] += value
+        for topic, performance in partial['topic_performance'].items():
+            merged = self.analysis['topic_performance'].setdefault(topic, {'correct': 0, 'total': 0, 'mistakes': 0})
+            for key, value in performance.items():
+                merged[key] += value
+
+        # Only two small columns per row survive the chunk, for the time-ordered trend
+        self._timestamps.append(columns.submitted_at)
+        self._accuracies.append(columns.accuracy)
+
+    def result(self):
+        analysis = dict(self.analysis)
+        if self._timestamps:
+            order = np.argsort(np.concatenate(self._timestamps), kind='stable')
+            analysis['accuracy_trends'] = np.concatenate(self._accuracies)[order].tolist()
+        return analysis
+
+# Question-level analysis of response maps scored in bulk against a quiz's answer key
+@timed_stage("analyze_responses")
+def analyze_responses(answer_key: AnswerKey, submissions: List[SubmissionData]):
+    response_maps = [submission.response_map for submission in submissions if submission.quiz_id == answer_key.quiz_id]
+    matrix = answer_key.score(response_maps)
+    correct = matrix.correct.sum(axis=0)
+    incorrect = matrix.incorrect.sum(axis=0)
+    unanswered = matrix.unanswered.sum(axis=0)
+
+    def summarize(correct, incorrect, unanswered):
+        attempted = correct + incorrect
+        return {
+            'correct': int(correct),
+            'incorrect': int(incorrect),
+            'unanswered': int(unanswered),
+            'accuracy': float(correct / attempted) if attempted > 0 else 0
+        }
+
+    # Group the per-question counts by difficulty and by topic
+    def grouped(codes, size):
+        return [np.bincount(codes, weights=counts, minlength=size) for counts in (correct, incorrect, unanswered)]
+
+    difficulty_sums = grouped(answer_key.difficulty_codes, len(answer_key.difficulty_levels))
+    topic_ids, topic_codes = np.unique(answer_key.topic_ids, return_inverse=True)
+    topic_sums = grouped(topic_codes, len(topic_ids))
+
+    return {
+        'total_submissions': len(response_maps),
+        'question_performance': {
+            str(question_id): summarize(*counts)
+            for question_id, counts in zip(answer_key.question_ids.tolist(), zip(correct, incorrect, unanswered))
+        },
+        'difficulty_performance': {
+            level: summarize(*(sums[code] for sums in difficulty_sums))
+            for code, level in enumerate(answer_key.difficulty_levels)
+        },
+        'topic_performance': {
+            answer_key.topic_names[topic_id]: summarize(*(sums[code] for sums in topic_sums))
+            for code, topic_id in enumerate(topic_ids.tolist())
+        }
     }
 
 # Function to generate insights from the analysis
+@timed_stage("generate_insights")
 def generate_insights(analysis_data):
     # Calculate averages and other insights
     average_accuracy = analysis_data['total_accuracy'] / analysis_data['total_quizzes'] if analysis_data['total_quizzes'] > 0 else 0
@@ -75,7 +190,7 @@ def generate_insights(analysis_data):
                 'mistakes': performance['mistakes']
             }
 
-    improvement_trend = "Improved" if analysis_data['accuracy_trends'][-1] > analysis_data['accuracy_trends'][0] else "No Significant Change"
+    trend = improvement_trend(analysis_data['accuracy_trends'][0], analysis_data['accuracy_trends'][-1])
 
     return {
         'Overall Performance': {
@@ -87,24 +202,43 @@ def generate_insights(analysis_data):
             'Average Mistakes Corrected': average_mistakes_corrected
         },
         'Weak Areas': weak_areas,
-        'Improvement Trends': improvement_trend
+        'Improvement Trends': trend
     }
 
+# Compare the earliest accuracy with the latest one
+def improvement_trend(first_accuracy: float, last_accuracy: float):
+    return "Improved" if last_accuracy > first_accuracy else "No Significant Change"
+
 # Rank prediction function
+@timed_stage("prediction")
 def predict_rank(features, theta):
     features = np.array([1] + list(features))  # Adding intercept term
     return features @ theta
 
 # College prediction based on rank
-def predict_college(predicted_rank: float):
-    for college, rank_range in colleges.items():
-        if rank_range["rank_lower"] <= predicted_rank <= rank_range["rank_upper"]:
-            return college
-    
-    return "No college found"
+@timed_stage("prediction")
+def predict_college(predicted_rank: float, category=None, year=None):
+    # Closest eligible college in the current cutoff table (GENERAL, latest year unless given)
+    matches = college_cutoffs.current().query(predicted_rank, category=category, year=year)
+    return matches[0].college if matches else "No college found"
+
+# Batch rank prediction: a single matrix-times-theta product for every feature row
+@timed_stage("prediction")
+def predict_rank_batch(feature_matrix, theta):
+    features = np.asarray(feature_matrix, dtype=float).reshape(-1, len(theta) - 1)
+    features = np.c_[np.ones(features.shape[0]), features]  # Adding intercept term
+    return features @ theta
+
+# Batch college prediction over the cutoff index
+@timed_stage("prediction")
+def predict_college_batch(predicted_ranks, category=None, year=None):
+    colleges = college_cutoffs.current().best_batch(predicted_ranks, category=category, year=year)
+    return [college or "No college found" for college in colleges]
 
 # Function to visualize performance analysis
-def visualize_performance(analysis_data):
+def visualize_performance(analysis_data, output_dir=None, prefix=""):
+    output_dir = output_dir or os.getcwd()
+
     # Plot accuracy trends
     plt.figure(figsize=(10, 5))
     plt.plot(analysis_data['accuracy_trends'], marker='o')
@@ -112,7 +246,7 @@ def visualize_performance(analysis_data):
     plt.xlabel('Quiz Number')
     plt.ylabel('Accuracy')
     plt.grid(True)
-    plt.savefig(os.path.join(os.getcwd(), 'accuracy_trends.png'))
+    plt.savefig(os.path.join(output_dir, f'{prefix}accuracy_trends.png'))
     plt.close()
 
     # Plot topic performance
@@ -135,5 +269,5 @@ def visualize_performance(analysis_data):
     ax.legend()
 
     fig.tight_layout()
-    plt.savefig(os.path.join(os.getcwd(), 'topic_performance.png'))
+    plt.savefig(os.path.join(output_dir, f'{prefix}topic_performance.png'))
     plt.close()
\ No newline at end of file
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from api.answer_key import AnswerKey
+from api.columnar import SubmissionColumns
+from api.metrics import timed
+from api.models import Quiz, SubmissionData
+from api.polling import PollingLoader, file_signature
+from api.registry import dataset_fingerprint
+
+logger = logging.getLogger(__name__)
+
+DATA_DIRECTORY = "data"
+DATA_FILES = ("current_quiz_data", "historical_data", "submission_data")
+RELOAD_INTERVAL = 2.0
+
+
+# Everything the request handlers read, parsed and validated once per data version
+@dataclass(frozen=True)
+class DataSnapshot:
+    version: str  # Content hash of the data files
+    modified_at: datetime  # Newest mtime among the data files
+    quiz: Quiz
+    historical_submissions: Tuple[SubmissionData, ...]
+    submission: SubmissionData
+    historical_columns: SubmissionColumns
+    historical_fingerprint: str
+    answer_key: AnswerKey  # Answer key of the current quiz
+
+
+def snapshot_version(contents: Dict[str, bytes]) -> str:
+    digest = hashlib.sha256()
+    for name in DATA_FILES:
+        digest.update(hashlib.sha256(contents[name]).digest())
+    return digest.hexdigest()[:16]
+
+
+def build_snapshot(contents: Dict[str, bytes], modified_at: datetime) -> DataSnapshot:
+    current_quiz_data = json.loads(contents["current_quiz_data"])
+    historical_data = json.loads(contents["historical_data"])
+    submission_data = json.loads(contents["submission_data"])
+
+    historical_submissions = tuple(SubmissionData(**data) for data in historical_data)
+    quiz = Quiz(**current_quiz_data.get("quiz"))
+    return DataSnapshot(
+        version=snapshot_version(contents),
+        modified_at=modified_at,
+        quiz=quiz,
+        historical_submissions=historical_submissions,
+        submission=SubmissionData(**submission_data),
+        historical_columns=SubmissionColumns.from_submissions(historical_submissions),
+        historical_fingerprint=dataset_fingerprint(historical_submissions),
+        answer_key=AnswerKey.from_quiz_data(current_quiz_data.get("quiz")),
+    )
+
+
+class SnapshotLoader(PollingLoader):
+    """Holds the current DataSnapshot and swaps in a new one when the data files change."""
+
+    thread_name = "snapshot-loader"
+    reload_error = "Failed to reload data snapshot"
+
+    def __init__(self, directory: str = DATA_DIRECTORY, interval: float = RELOAD_INTERVAL):
+        super().__init__(interval)
+        self.directory = directory
+        self._snapshot: Optional[DataSnapshot] = None
+        self._signatures: Dict[str, Optional[Tuple[int, int]]] = {}
+        self._subscribers: List[Callable[[DataSnapshot], None]] = []
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def current(self) -> DataSnapshot:
+        # A single attribute read; the snapshot itself is never mutated
+        return self._snapshot
+
+    def subscribe(self, callback: Callable[[DataSnapshot], None]):
+        # Callbacks run with the current snapshot now and again after every swap
+        self._subscribers.append(callback)
+        callback(self._snapshot)
+
+    def refresh(self) -> bool:
+        with self._lock:
+            signatures = {name: self._signature(name) for name in DATA_FILES}
+            if signatures == self._signatures:
+                return False
+
+            contents = {}
+            with timed("data_load"):
+                for name in DATA_FILES:
+                    with open(self._path(name), "rb") as file:
+                        contents[name] = file.read()
+            modified_at = datetime.fromtimestamp(max(mtime for mtime, _ in signatures.values()) / 1e9, tz=timezone.utc)
+
+            # Touched but unchanged files only update the recorded mtimes
+            if self._snapshot is not None and snapshot_version(contents) == self._snapshot.version:
+                self._signatures = signatures
+                return False
+            with timed("model_validation"):
+                snapshot = build_snapshot(contents, modified_at)
+            self._signatures = signatures
+            self._snapshot = snapshot
+
+        logger.info("Loaded data snapshot %s", snapshot.version)
+        for callback in self._subscribers:
+            callback(snapshot)
+        return True
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.json")
+
+    def _signature(self, name: str) -> Optional[Tuple[int, int]]:
+        return file_signature(self._path(name))
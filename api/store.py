@@ -0,0 +1,209 @@
+import argparse
+import json
+import logging
+import sys
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from sqlalchemy import JSON, Column, Index, event, func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Field, Session, SQLModel, create_engine, select
+from api.columnar import epoch_micros
+from api.metrics import timed_stage
+
+logger = logging.getLogger(__name__)
+
+DATABASE_URL = "sqlite:///data/submissions.db"
+INSERT_BATCH = 5000
+
+
+class SubmissionRow(SQLModel, table=True):
+    """One submission, flattened to the fields the analysis and rank model read."""
+
+    __tablename__ = "submission"
+    __table_args__ = (Index("ix_submission_user_id_submitted_at", "user_id", "submitted_at"),)
+
+    row_id: Optional[int] = Field(default=None, primary_key=True)  # Insertion order, keeps topics in first-seen order
+    id: Optional[int] = Field(default=None, unique=True)  # Submission id from the source data
+    quiz_id: int = Field(index=True)
+    user_id: str = Field(index=True)
+    submitted_at: int = Field(index=True)  # Epoch microseconds, so ordering ignores the stored UTC offset
+    topic: str = Field(default="", index=True)  # Denormalized from the quiz
+    score: int
+    accuracy: float
+    final_score: float
+    negative_score: float
+    better_than: int
+    mistakes_corrected: int
+    correct_answers: int
+    incorrect_answers: int
+    total_questions: int
+    response_map: Optional[Dict[str, int]] = Field(default=None, sa_column=Column(JSON))
+
+
+def row_values(submission) -> Dict[str, Any]:
+    # Accepts SubmissionData or SubmissionRecord; trusted records carry no response map
+    return {
+        "id": submission.id,
+        "quiz_id": submission.quiz_id,
+        "user_id": submission.user_id,
+        "submitted_at": epoch_micros(submission.submitted_at),
+        "topic": submission.quiz.topic or "",
+        "score": submission.score,
+        "accuracy": submission.accuracy,
+        "final_score": submission.final_score,
+        "negative_score": submission.negative_score,
+        "better_than": submission.better_than,
+        "mistakes_corrected": submission.mistakes_corrected,
+        "correct_answers": submission.correct_answers,
+        "incorrect_answers": submission.incorrect_answers,
+        "total_questions": submission.total_questions,
+        "response_map": getattr(submission, "response_map", None),
+    }
+
+
+class SubmissionStore:
+    """SQLite-backed submissions with indexed lookups and the analysis totals computed in SQL."""
+
+    def __init__(self, url: str = DATABASE_URL, pool_size: int = 5):
+        self.url = url
+        if make_url(url).database in (None, "", ":memory:"):
+            # An in-memory database lives and dies with its connection, so every thread shares one
+            pool_args = {"poolclass": StaticPool}
+        else:
+            # One pooled connection per worker thread; WAL lets readers run alongside the writer
+            pool_args = {"pool_size": pool_size, "max_overflow": pool_size, "pool_pre_ping": True}
+        self.engine = create_engine(url, connect_args={"check_same_thread": False}, **pool_args)
+        event.listen(self.engine, "connect", _configure_connection)
+        self.sessions = sessionmaker(self.engine, class_=Session, expire_on_commit=False)
+        SQLModel.metadata.create_all(self.engine, tables=[SubmissionRow.__table__])
+
+    @contextmanager
+    def session(self) -> Iterator[Session]:
+        with self.sessions() as session:
+            with session.begin():
+                yield session
+
+    def add_submissions(self, submissions: Iterable, batch_size: int = INSERT_BATCH) -> int:
+        # Executemany in batches inside one transaction; a known submission id updates its row in place
+        table = SubmissionRow.__table__
+        statement = insert(table)
+        updated = {column.name: statement.excluded[column.name] for column in table.columns if column.name not in ("row_id", "id")}
+        statement = statement.on_conflict_do_update(index_elements=["id"], set_=updated)
+
+        count = 0
+        with self.session() as session:
+            batch = []
+            for submission in submissions:
+                batch.append(row_values(submission))
+                if len(batch) == batch_size:
+                    session.execute(statement, batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                session.execute(statement, batch)
+                count += len(batch)
+        return count
+
+    def __len__(self) -> int:
+        with self.session() as session:
+            return session.exec(select(func.count()).select_from(SubmissionRow)).one()
+
+    @timed_stage("analyze_performance")
+    def analysis(self, user_id: Optional[str] = None, quiz_id: Optional[int] = None, topic: Optional[str] = None):
+        # Same dict as analyze_performance; only the grouped sums and the trend leave the database
+        filters = []
+        if user_id is not None:
+            filters.append(SubmissionRow.user_id == user_id)
+        if quiz_id is not None:
+            filters.append(SubmissionRow.quiz_id == quiz_id)
+        if topic is not None:
+            filters.append(SubmissionRow.topic == topic)
+
+        with self.session() as session:
+            totals = session.exec(select(
+                func.count(),
+                func.total(SubmissionRow.accuracy),
+                func.coalesce(func.sum(SubmissionRow.score), 0),
+                func.total(SubmissionRow.final_score),
+                func.total(SubmissionRow.negative_score),
+                func.coalesce(func.sum(SubmissionRow.better_than), 0),
+                func.coalesce(func.sum(SubmissionRow.mistakes_corrected), 0),
+            ).where(*filters)).one()
+
+            # Topics in order of their first submission, like the dict built by the row-wise loop
+            topics = session.exec(
+                select(
+                    SubmissionRow.topic,
+                    func.sum(SubmissionRow.correct_answers),
+                    func.sum(SubmissionRow.total_questions),
+                    func.sum(SubmissionRow.incorrect_answers),
+                )
+                .where(SubmissionRow.topic != "", *filters)
+                .group_by(SubmissionRow.topic)
+                .order_by(func.min(SubmissionRow.row_id))
+            ).all()
+
+            trends = session.exec(
+                select(SubmissionRow.accuracy)
+                .where(*filters)
+                .order_by(SubmissionRow.submitted_at, SubmissionRow.row_id)
+            ).all()
+
+        quizzes, accuracy, score, final_score, negative_score, rank, mistakes_corrected = totals
+        return {
+            'total_accuracy': accuracy,
+            'total_score': score,
+            'total_final_score': final_score,
+            'total_negative_score': negative_score,
+            'total_rank': rank,
+            'total_mistakes_corrected': mistakes_corrected,
+            'total_quizzes': quizzes,
+            'topic_performance': {
+                name: {'correct': correct, 'total': total, 'mistakes': mistakes}
+                for name, correct, total, mistakes in topics
+            },
+            'accuracy_trends': list(trends),
+        }
+
+
+def _configure_connection(connection, _record):
+    cursor = connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    from api.ingest import iter_submission_chunks
+    from api.service import generate_insights
+
+    parser = argparse.ArgumentParser(description="Load submissions into the SQLite store, or analyze what it holds.")
+    parser.add_argument("--database", default=DATABASE_URL)
+    commands = parser.add_subparsers(dest="command", required=True)
+    load = commands.add_parser("import", help="Import a historical submissions file (NDJSON or JSON array)")
+    load.add_argument("path")
+    load.add_argument("--trusted", action="store_true", help="Skip model validation for data that was already validated")
+    analyze = commands.add_parser("analysis", help="Print the analysis and insights from the stored submissions")
+    analyze.add_argument("--user-id")
+    analyze.add_argument("--quiz-id", type=int)
+    analyze.add_argument("--topic")
+    args = parser.parse_args(argv)
+
+    store = SubmissionStore(args.database)
+    if args.command == "import":
+        chunks = iter_submission_chunks(args.path, trusted=args.trusted, on_error=lambda error: logger.warning("Skipping record %s: %s", error.position, error.message))
+        count = store.add_submissions(submission for chunk in chunks for submission in chunk)
+        print(f"Imported {count} submissions into {args.database} ({len(store)} stored)")
+        return
+
+    analysis = store.analysis(args.user_id, args.quiz_id, args.topic)
+    json.dump({"analysis": analysis, "insights": generate_insights(analysis) if analysis['total_quizzes'] else None}, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main()
@@ -1,6 +1,12 @@
 from fastapi.testclient import TestClient
 from api.main import app  # Import your FastAPI app (make sure the app is correctly imported)
+from api.snapshot import SnapshotLoader
+from api import controller
+from api.store import SubmissionStore
+from api.insights_file import InsightsFile, InsightsWriter
+from collections import deque
 import json
+import shutil
 
 client = TestClient(app)
 
@@ -20,6 +26,21 @@ def test_analyze_performance():
     assert "total_score" in data
     assert "total_quizzes" in data
 
+# Test for the "POST /analyze-performance" endpoint and the chart it links to
+def test_analyze_performance_charts():
+    response = client.post("/analyze-performance", json=[submission_data])
+
+    assert response.status_code == 200
+    assert "insights" in response.json()
+    charts = response.json()["charts"]
+    chart = client.get(charts["accuracy_trends"])
+    assert chart.status_code == 200
+    assert chart.headers["content-type"] == "image/png"
+    assert "immutable" in chart.headers["cache-control"]
+
+def test_unknown_chart_returns_404():
+    assert client.get(f"/charts/{'0' * 64}/accuracy_trends.png").status_code == 404
+
 # Test for the "/generate-insights" endpoint
 def test_generate_insights():
     response = client.get("/generate-insights")
@@ -31,6 +52,124 @@ def test_generate_insights():
     assert "Weak Areas" in data
     assert "Improvement Trends" in data
 
+# Tests for the "/question-analysis" endpoints
+def test_question_analysis():
+    response = client.post("/question-analysis", json=[submission_data, submission_data])
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total_submissions"] == 2
+    assert sum(q["correct"] for q in data["question_performance"].values()) == 2 * submission_data["correct_answers"]
+    assert "unknown" in data["difficulty_performance"]
+
+    assert client.get("/question-analysis").json()["total_submissions"] == 1
+
+    # Keys that are not question ids are skipped rather than failing the batch
+    odd = dict(submission_data, response_map={**submission_data["response_map"], "notes": 1, "9" * 30: 2})
+    response = client.post("/question-analysis", json=[odd, submission_data])
+    assert response.status_code == 200
+    assert sum(q["correct"] for q in response.json()["question_performance"].values()) == 2 * submission_data["correct_answers"]
+
+# Tests for the user-scoped endpoints
+def test_user_analysis_and_insights():
+    with open("data/historical_data.json", "r") as file:
+        user_id = json.load(file)[0]["user_id"]
+
+    analysis = client.get(f"/users/{user_id}/analysis")
+    assert analysis.status_code == 200
+    assert analysis.json()["total_quizzes"] > 0
+
+    insights = client.get(f"/users/{user_id}/insights")
+    assert insights.status_code == 200
+    assert "Improvement Trends" in insights.json()
+
+def test_unknown_user_returns_404():
+    assert client.get("/users/unknown-user/analysis").status_code == 404
+    assert client.get("/users/unknown-user/insights").status_code == 404
+
+# Users outside the loaded history are answered from the precomputed insights file
+def test_precomputed_user_insights(tmp_path, monkeypatch):
+    path = str(tmp_path / "insights.bin")
+    with InsightsWriter(path) as writer:
+        writer.add("offline-user", json.dumps({"analysis": {"total_quizzes": 3}, "insights": {"Improvement Trends": "Improved"}}).encode())
+    monkeypatch.setattr("api.controller.precomputed_insights", InsightsFile(path))
+
+    assert client.get("/users/offline-user/analysis").json() == {"total_quizzes": 3}
+    assert client.get("/users/offline-user/insights").json() == {"Improvement Trends": "Improved"}
+    assert client.get("/users/unknown-user/insights").status_code == 404
+
+# Test for the "/submissions" endpoint
+def test_record_submission():
+    response = client.post("/submissions", json=submission_data)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["user_id"] == submission_data["user_id"]
+    assert "Overall Performance" in data["insights"]
+
+# Posted submissions must survive a reload of the data files
+def test_record_submission_survives_reload(tmp_path, monkeypatch):
+    monkeypatch.setattr("api.controller.live_submissions", deque())
+    new_submission = dict(submission_data, id=None, user_id="new-student")
+    assert client.post("/submissions", json=new_submission).status_code == 200
+
+    for name in ("current_quiz_data", "historical_data", "submission_data"):
+        shutil.copy(f"data/{name}.json", tmp_path / f"{name}.json")
+    with open(tmp_path / "historical_data.json") as file:
+        history = json.load(file)
+    with open(tmp_path / "historical_data.json", "w") as file:
+        json.dump(history[1:], file)
+    controller.rebuild_user_state(SnapshotLoader(directory=str(tmp_path)).current())
+
+    assert client.get("/users/new-student/insights").status_code == 200
+    assert client.get("/users/new-student/analysis").json()["total_quizzes"] == 1
+    controller.rebuild_user_state(controller.data_snapshots.current())
+
+# A rejected submission changes no state and never reaches the replay log; accepted ones leave it
+# once the history file holds them
+def test_rejected_submission_is_not_replayed(monkeypatch):
+    monkeypatch.setattr("api.controller.live_submissions", deque())
+    history = controller.data_snapshots.current().historical_submissions
+    user_id = history[0].user_id
+    before = client.get(f"/users/{user_id}/analysis").json()["total_quizzes"]
+
+    def reject(submission):
+        raise ValueError("rejected")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(controller.user_aggregates, "add", reject)
+        assert client.post("/submissions", json=dict(submission_data, id=-5, user_id=user_id)).status_code == 500
+    assert not controller.live_submissions
+    assert client.get(f"/users/{user_id}/analysis").json()["total_quizzes"] == before
+
+    assert client.post("/submissions", json=dict(submission_data, id=history[0].id, user_id="replayed-student")).status_code == 200
+    assert len(controller.live_submissions) == 1
+    controller.rebuild_user_state(controller.data_snapshots.current())
+    assert not controller.live_submissions  # Already in the history file
+
+# Test for the "/submissions/analysis" endpoint, backed by a scratch database
+def test_stored_submission_analysis(tmp_path, monkeypatch):
+    assert client.get("/submissions/analysis").status_code == 503
+
+    monkeypatch.setattr("api.controller.submission_store", SubmissionStore(f"sqlite:///{tmp_path / 'submissions.db'}"))
+    assert client.post("/submissions", json=submission_data).status_code == 200
+
+    response = client.get("/submissions/analysis", params={"user_id": submission_data["user_id"]})
+    assert response.status_code == 200
+    assert response.json()["total_quizzes"] == 1
+    assert response.json()["total_score"] == submission_data["score"]
+
+# Test for the "/percentile" endpoint
+def test_score_percentile():
+    response = client.get("/percentile", params={"score": submission_data["final_score"], "quiz_id": submission_data["quiz_id"]})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["cohort_size"] >= 1
+    assert 0 <= data["percentile"] <= 100
+
+    assert client.get("/percentile", params={"score": 10, "quiz_id": -1}).status_code == 404
+    assert client.get("/percentile", params={"score": 10}).status_code == 422
+
 # Test for the "/predict-rank" endpoint
 def test_predict_rank():
     response = client.post("/predict-rank", json=submission_data)
@@ -41,6 +180,25 @@ def test_predict_rank():
 
     # Check if the predicted rank key is in the response
     assert "predicted_rank" in data
+    assert "model_version" in data
+
+# Repeated predictions should be served by the same cached model version
+def test_predict_rank_reuses_model():
+    first = client.post("/predict-rank", json=submission_data).json()
+    second = client.post("/predict-rank", json=submission_data).json()
+    assert first["model_version"] == second["model_version"]
+    assert first["predicted_rank"] == second["predicted_rank"]
+
+# Test for the "/predict-rank/batch" endpoint
+def test_predict_rank_batch():
+    single = client.post("/predict-rank", json=submission_data).json()
+    response = client.post("/predict-rank/batch", json=[submission_data, submission_data])
+
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["predicted_ranks"]) == 2
+    assert len(data["predicted_colleges"]) == 2
+    assert abs(data["predicted_ranks"][0] - single["predicted_rank"]) < 1e-6
 
 # Test for the "/predict-college" endpoint
 def test_predict_college():
@@ -54,7 +212,62 @@ def test_predict_college():
     # Check if the college prediction is returned correctly
     assert "predicted_college" in data
 
-test_analyze_performance()
-test_generate_insights()
-test_predict_rank()
-test_predict_college()
\ No newline at end of file
+# Test for the "/predict-college/batch" endpoint
+def test_predict_college_batch():
+    response = client.post("/predict-college/batch", json={"predicted_ranks": [250, 7000, 500000], "category": "general"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["predicted_colleges"] == ["College A", "College C", "No college found"]
+    assert data["eligible_colleges"][0][0]["closing_rank"] == 1000
+
+# Malformed college prediction bodies are rejected before they reach the index
+def test_predict_college_validation():
+    # A numeric string year is read as that year rather than silently matching nothing
+    response = client.post("/predict-college", json={"predicted_rank": 250, "year": "2024"})
+    assert response.status_code == 200
+    assert response.json()["predicted_college"] == "College A"
+
+    assert client.post("/predict-college", json={"category": "general"}).status_code == 422
+    assert client.post("/predict-college", json={"predicted_rank": 250, "year": "latest"}).status_code == 422
+    assert client.post("/predict-college/batch", json={"predicted_ranks": 250}).status_code == 422
+    assert client.post("/predict-college/batch", json={"predicted_ranks": [250, "first"]}).status_code == 422
+
+# Conditional GETs and compression for the cached snapshot-wide routes
+def test_cached_responses_revalidate():
+    for path in ("/", "/analyze-performance", "/generate-insights"):
+        response = client.get(path)
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"  # TestClient sends Accept-Encoding: gzip
+        etag, last_modified = response.headers["etag"], response.headers["last-modified"]
+
+        assert client.get(path, headers={"If-None-Match": etag}).status_code == 304
+        assert client.get(path, headers={"If-None-Match": '"other"'}).status_code == 200
+        assert client.get(path, headers={"If-Modified-Since": last_modified}).status_code == 304
+
+        plain = client.get(path, headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in plain.headers
+        assert plain.content == response.content
+
+# Test for the "/metrics" endpoint
+def test_metrics():
+    client.get("/generate-insights")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'route="/generate-insights"' in response.text
+    assert 'stage="generate_insights"' in response.text
+
+# Test for the per-request profiler hook, which needs the profiling token
+def test_profile_header(monkeypatch):
+    response = client.get("/analyze-performance", headers={"X-Profile": "1"})
+    assert "X-Profile-Id" not in response.headers  # Off without a token
+
+    monkeypatch.setattr("api.metrics.PROFILE_TOKEN", "secret")
+    assert "X-Profile-Id" not in client.get("/analyze-performance", headers={"X-Profile": "1"}).headers
+    response = client.get("/analyze-performance", headers={"X-Profile": "secret"})
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+    assert client.get(f"/debug/profiles/{profile_id}").status_code == 404
+    assert client.get(f"/debug/profiles/{profile_id}", headers={"X-Profile": "secret"}).status_code == 200
+    assert "X-Profile-Id" not in client.get("/analyze-performance").headers
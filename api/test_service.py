@@ -0,0 +1,382 @@
+from api.columnar import SubmissionColumns
+from api.models import SubmissionData
+from api.service import analyze_performance, analyze_columns, generate_insights
+from api.aggregates import AggregateStore
+from api.user_index import UserIndex
+from api.snapshot import SnapshotLoader
+from api.ingest import ingest_submissions, iter_submission_chunks
+from api.utils import rank_training_data, train_rank_predictor
+from api.training import IncrementalRankTrainer
+from api.store import SubmissionStore
+from api.percentiles import CohortScores, PercentileEngine
+from api.cutoffs import Cutoff, CutoffIndex, CutoffLoader
+from api.models import colleges
+from api.service import predict_college, predict_college_batch
+from api.batch_insights import run as run_batch_insights
+from api.insights_file import InsightsFile
+from api.response_cache import ResponseCache
+from datetime import datetime, timedelta, timezone
+from api.records import SourceSpan, SubmissionRecord
+import numpy as np
+import pytest
+import json
+import os
+import shutil
+import threading
+import time
+
+# Load historical submissions from historical_data.json
+with open("data/historical_data.json", "r") as file:
+    historical_submissions = [SubmissionData(**data) for data in json.load(file)]
+
+# The columnar engine must reproduce the row-wise analysis exactly
+def test_analyze_columns_matches_analyze_performance():
+    columns = SubmissionColumns.from_submissions(historical_submissions)
+    assert analyze_columns(columns) == analyze_performance(historical_submissions)
+
+def test_analyze_columns_skips_empty_topics():
+    untitled = historical_submissions[0].model_copy(update={"quiz": historical_submissions[0].quiz.model_copy(update={"topic": ""})})
+    submissions = [untitled] + historical_submissions[1:]
+    columns = SubmissionColumns.from_submissions(submissions)
+    assert analyze_columns(columns) == analyze_performance(submissions)
+
+def test_analyze_columns_empty():
+    columns = SubmissionColumns.from_submissions([])
+    assert analyze_columns(columns) == analyze_performance([])
+
+# Concatenated chunks must analyze the same as one block built from all rows
+def test_concat_columns_merges_topics():
+    parts = [SubmissionColumns.from_submissions(historical_submissions[start:start + 4]) for start in range(0, len(historical_submissions), 4)]
+    merged = SubmissionColumns.concat(parts)
+    assert analyze_columns(merged) == analyze_performance(historical_submissions)
+
+# Aggregates maintained one submission at a time must match a full rescan
+def test_aggregates_match_full_analysis():
+    index = UserIndex.from_submissions(historical_submissions)
+    store = AggregateStore.from_submissions(index.submissions(), trend_size=len(historical_submissions))
+    user_id = historical_submissions[0].user_id
+    assert store.get(user_id).analysis() == analyze_performance(index.get(user_id))
+
+def test_aggregate_trend_buffer_is_bounded():
+    store = AggregateStore.from_submissions(historical_submissions, trend_size=3)
+    aggregate = store.get(historical_submissions[0].user_id)
+    newest = sorted(historical_submissions, key=lambda s: s.submitted_at)[-3:]
+    assert aggregate.accuracy_trends == [s.accuracy for s in newest]
+    assert aggregate.insights() == generate_insights(analyze_performance(historical_submissions))
+
+# A back-dated submission joins the trend in time order, so it agrees with the full analysis
+def test_aggregate_trend_orders_back_dated_submissions():
+    store = AggregateStore.from_submissions(historical_submissions)
+    oldest = min(historical_submissions, key=lambda s: s.submitted_at)
+    back_dated = oldest.model_copy(update={"id": -1, "accuracy": 0.01, "submitted_at": oldest.submitted_at - timedelta(days=1)})
+    aggregate = store.add(back_dated)
+    expected = analyze_performance(historical_submissions + [back_dated])
+    assert aggregate.analysis()["accuracy_trends"] == expected["accuracy_trends"]
+    assert aggregate.accuracy_trends[0] == 0.01
+
+    # A naive timestamp is read as UTC instead of failing against the aware ones
+    naive = oldest.model_copy(update={"id": -2, "submitted_at": datetime(2025, 1, 18, 10, 0)})
+    assert store.add(naive).total_quizzes == len(historical_submissions) + 2
+
+# The index keeps each user's submissions in time order, whatever the list order
+def test_user_index_orders_by_submitted_at():
+    index = UserIndex.from_submissions(historical_submissions)
+    user_submissions = index.get(historical_submissions[0].user_id)
+    assert [s.submitted_at for s in user_submissions] == sorted(s.submitted_at for s in historical_submissions)
+
+    index.add(user_submissions[0].model_copy(update={"id": -1}))
+    assert index.get(historical_submissions[0].user_id)[1].id == -1
+    assert index.get("unknown-user") is None
+
+# Improvement trend compares the earliest submission with the latest one
+def test_improvement_trend_uses_time_order():
+    analysis = analyze_performance(list(reversed(historical_submissions)))
+    assert analysis["accuracy_trends"] == analyze_performance(historical_submissions)["accuracy_trends"]
+    oldest = min(historical_submissions, key=lambda s: s.submitted_at)
+    newest = max(historical_submissions, key=lambda s: s.submitted_at)
+    assert analysis["accuracy_trends"][0] == oldest.accuracy
+    assert analysis["accuracy_trends"][-1] == newest.accuracy
+
+    # Naive and aware timestamps can be mixed; naive ones are read as UTC
+    naive = oldest.model_copy(update={"accuracy": 0.01, "submitted_at": datetime(2000, 1, 1)})
+    assert analyze_performance(historical_submissions + [naive])["accuracy_trends"][0] == 0.01
+
+# Snapshots reload only when a data file's content changes
+def test_snapshot_reloads_on_change(tmp_path):
+    for name in ("current_quiz_data", "historical_data", "submission_data"):
+        shutil.copy(f"data/{name}.json", tmp_path / f"{name}.json")
+    loader = SnapshotLoader(directory=str(tmp_path))
+    first = loader.current()
+    assert len(first.historical_submissions) == len(historical_submissions)
+
+    # Touching a file without changing it keeps the snapshot
+    historical_path = tmp_path / "historical_data.json"
+    stat = os.stat(historical_path)
+    os.utime(historical_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert loader.refresh() is False
+    assert loader.current() is first
+
+    with open(historical_path, "r") as file:
+        data = json.load(file)
+    with open(historical_path, "w") as file:
+        json.dump(data[:5], file)
+    assert loader.refresh() is True
+    assert loader.current().version != first.version
+    assert len(loader.current().historical_submissions) == 5
+
+# Streaming ingestion reads NDJSON and JSON arrays in bounded chunks and reports bad records
+def test_ingest_ndjson_reports_malformed_records(tmp_path):
+    with open("data/historical_data.json", "r") as file:
+        records = json.load(file)
+    path = tmp_path / "historical.ndjson"
+    with open(path, "w") as file:
+        for record in records:
+            file.write(json.dumps(record) + "\n")
+        file.write("{not json\n")
+        file.write(json.dumps({"user_id": "missing-fields"}) + "\n")
+
+    result = ingest_submissions(str(path), chunk_size=4)
+    assert result.records == len(historical_submissions)
+    assert [error.position for error in result.errors] == [len(records) + 1, len(records) + 2]
+
+    expected = analyze_performance(historical_submissions)
+    assert result.analysis["total_score"] == expected["total_score"]
+    assert result.analysis["total_accuracy"] == pytest.approx(expected["total_accuracy"])
+    assert result.analysis["topic_performance"] == expected["topic_performance"]
+    assert result.analysis["accuracy_trends"] == expected["accuracy_trends"]
+    assert np.allclose(result.theta, train_rank_predictor(historical_submissions))
+
+def test_ingest_json_array_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr("api.ingest.READ_SIZE", 256)  # Force records to span many reads
+    chunks = list(iter_submission_chunks("data/historical_data.json", chunk_size=5))
+    assert [len(chunk) for chunk in chunks] == [5, 5, 4]
+    assert [s.id for chunk in chunks for s in chunk] == [s.id for s in historical_submissions]
+
+# Trusted records feed the same analysis and training as fully validated models
+def test_trusted_records_match_models():
+    with open("data/historical_data.json", "r") as file:
+        records = [SubmissionRecord.from_dict(data, source=data) for data in json.load(file)]
+    assert analyze_performance(records) == analyze_performance(historical_submissions)
+    assert np.allclose(train_rank_predictor(records), train_rank_predictor(historical_submissions))
+    assert records[0].materialize() == historical_submissions[0]
+
+def test_trusted_ingestion_materializes_lazily():
+    chunks = list(iter_submission_chunks("data/historical_data.json", trusted=True))
+    record = chunks[0][0]
+    assert isinstance(record, SubmissionRecord)
+    assert isinstance(record._source, SourceSpan)  # Only the location is kept, not the text
+    assert [r.materialize() for r in chunks[0]] == list(historical_submissions)
+    with pytest.raises(ValueError):
+        SubmissionRecord.from_dict(json.loads(record._source.read())).materialize()
+
+# Byte offsets stay exact across multi-byte characters and CRLF line endings, in both formats
+@pytest.mark.parametrize("layout", ["array", "ndjson"])
+def test_trusted_records_reread_their_source(tmp_path, monkeypatch, layout):
+    monkeypatch.setattr("api.ingest.READ_SIZE", 256)
+    with open("data/historical_data.json", "r") as file:
+        data = json.load(file)
+    data[0]["quiz"]["topic"] = "Zoologie générale – Übungen"
+    path = tmp_path / "history.json"
+    if layout == "array":
+        path.write_bytes(json.dumps(data, indent=2, ensure_ascii=False).replace("\n", "\r\n").encode("utf-8"))
+    else:
+        path.write_bytes("".join(json.dumps(d, ensure_ascii=False) + "\r\n" for d in data).encode("utf-8"))
+
+    records = [r for chunk in iter_submission_chunks(str(path), trusted=True) for r in chunk]
+    assert [r.materialize() for r in records] == [SubmissionData(**d) for d in data]
+
+    path.write_bytes(path.read_bytes() + b" ")
+    with pytest.raises(ValueError):
+        records[1].materialize()  # The file changed underneath the stored offsets
+
+# The benchmark generator is deterministic and its columns agree with its models
+def test_synthetic_generator_is_deterministic():
+    from benchmarks.synthetic import generate_columns, generate_submissions
+    first, second = generate_submissions(50, 5), generate_submissions(50, 5)
+    assert [s.score for s in first] == [s.score for s in second]
+    assert analyze_columns(generate_columns(50, 5)) == analyze_performance(first)
+
+# Chunked updates, removals and the sliding window must agree with a batch fit on the same rows
+def test_incremental_trainer_matches_batch_fit():
+    trainer = IncrementalRankTrainer()
+    for start in range(0, len(historical_submissions), 3):
+        trainer.partial_fit(historical_submissions[start:start + 3])
+    assert np.allclose(trainer.theta(), train_rank_predictor(historical_submissions))
+
+    trainer.remove(historical_submissions[:5])
+    assert np.allclose(trainer.theta(), train_rank_predictor(historical_submissions[5:]))
+
+    windowed = IncrementalRankTrainer(window=6)
+    for start in range(0, len(historical_submissions), 4):
+        windowed.partial_fit(historical_submissions[start:start + 4])
+    assert windowed.weight == 6
+    assert np.allclose(windowed.theta(), train_rank_predictor(historical_submissions[-6:]))
+
+    # Once a full window has expired the statistics are recounted from the rows, not left to subtraction drift
+    recounted = IncrementalRankTrainer(window=6)
+    for submission in historical_submissions[:12]:
+        recounted.partial_fit([submission])
+    X, y = rank_training_data(historical_submissions[6:12])
+    X = np.c_[np.ones(X.shape[0]), X]
+    assert np.array_equal(recounted.xtx, X.T @ X)
+    assert np.array_equal(recounted.xty, X.T @ y)
+
+def test_incremental_trainer_decay_is_weighted_least_squares():
+    decay = 0.8
+    trainer = IncrementalRankTrainer(decay=decay)
+    trainer.partial_fit(historical_submissions[:9]).partial_fit(historical_submissions[9:])
+
+    X, y = rank_training_data(historical_submissions)
+    X = np.c_[np.ones(X.shape[0]), X]
+    weights = decay ** np.arange(len(y) - 1, -1, -1)
+    expected = np.linalg.pinv(X.T @ (X * weights[:, None])) @ (X * weights[:, None]).T @ y
+    assert np.allclose(trainer.theta(), expected)
+    with pytest.raises(ValueError):
+        trainer.remove(historical_submissions[:1])
+
+# The SQL aggregation must reproduce analyze_performance, and re-imports must not duplicate rows
+def test_store_analysis_matches_analyze_performance(tmp_path):
+    store = SubmissionStore(f"sqlite:///{tmp_path / 'submissions.db'}")
+    assert store.add_submissions(historical_submissions, batch_size=4) == len(historical_submissions)
+    store.add_submissions(historical_submissions)
+    assert len(store) == len(historical_submissions)
+    assert store.analysis() == analyze_performance(historical_submissions)
+
+    topic = historical_submissions[5].quiz.topic
+    subset = [s for s in historical_submissions if s.quiz.topic == topic]
+    assert store.analysis(topic=topic) == analyze_performance(subset)
+    assert store.analysis(user_id="unknown-user")["total_quizzes"] == 0
+
+    # A restart reads the same rows without touching the JSON
+    assert SubmissionStore(store.url).analysis() == analyze_performance(historical_submissions)
+
+# In-memory stores keep one shared connection, so rows written on one thread are read on another
+@pytest.mark.parametrize("url", ["sqlite://", "sqlite:///:memory:"])
+def test_in_memory_store(url):
+    store = SubmissionStore(url)
+    writer = threading.Thread(target=store.add_submissions, args=(historical_submissions,))
+    writer.start()
+    writer.join()
+    assert len(store) == len(historical_submissions)
+    assert store.analysis() == analyze_performance(historical_submissions)
+
+# Small cohorts are ranked exactly; the engine keys cohorts by quiz and by topic
+def test_percentile_engine_exact_cohorts():
+    engine = PercentileEngine.from_submissions(historical_submissions)
+    topic = historical_submissions[0].quiz.topic
+    scores = sorted(s.final_score for s in historical_submissions if s.quiz.topic == topic)
+
+    result = engine.percentile(scores[-1], topic=topic)
+    assert result["exact"] and result["cohort_size"] == len(scores)
+    assert result["estimated_rank"] == 1
+    assert engine.percentile(scores[0] - 1, topic=topic)["percentile"] == 0
+    quiz_id = historical_submissions[0].quiz_id
+    assert engine.percentile(0, quiz_id=quiz_id)["cohort_size"] == sum(s.quiz_id == quiz_id for s in historical_submissions)
+    assert engine.percentile(0, quiz_id=-1) is None
+
+# Large cohorts switch to the sketch, which stays bounded and close to the exact ranks, also after a merge
+def test_kll_sketch_rank_error_and_merge():
+    values = np.random.default_rng(0).normal(50, 20, 100_000).round()
+    ordered = np.sort(values)
+    first, second = CohortScores(exact_limit=1000), CohortScores(exact_limit=1000)
+    for value in values[:60_000]:
+        first.add(value)
+    for value in values[60_000:]:
+        second.add(value)
+    first.merge(second)
+
+    assert not first.exact and first.n == len(values)
+    assert sum(map(len, first.scores.levels)) <= 3 * first.k + len(first.scores.levels)
+    for score in (0, 25, 50, 75, 100):
+        expected = np.searchsorted(ordered, score, side="right")
+        assert abs(first.percentile(score)["estimated_rank"] - (len(values) - expected + 1)) < 0.02 * len(values)
+
+# Overlapping cutoff ranges: the interval tree must find exactly the ranges a brute-force scan finds
+def test_cutoff_index_matches_scan():
+    rng = np.random.default_rng(0)
+    opening = rng.integers(1, 50_000, 500)
+    cutoffs = [Cutoff(f"College {i}", "GENERAL" if i % 3 else "OBC", "AIQ", 2023 + i % 2, int(low), int(low + rng.integers(0, 20_000)))
+               for i, low in enumerate(opening)]
+    index = CutoffIndex(cutoffs)
+
+    ranks = rng.integers(1, 70_000, 200)
+    for rank, matches in zip(ranks, index.query_batch(ranks, category="obc", year=2023)):
+        expected = [c for c in cutoffs if c.category == "OBC" and c.year == 2023 and c.opening_rank <= rank <= c.closing_rank]
+        assert sorted(matches, key=lambda c: c.college) == sorted(expected, key=lambda c: c.college)
+        assert [c.closing_rank for c in matches] == sorted(c.closing_rank for c in matches)
+    assert index.best_batch(ranks[:5], category="OBC", year=2023) == [m[0].college if m else None for m in index.query_batch(ranks[:5], category="OBC", year=2023)]
+
+# Without a year, each category falls back to its own latest table
+def test_cutoff_index_defaults_to_latest_year_per_category():
+    index = CutoffIndex([
+        Cutoff("College A", "GENERAL", "AIQ", 2024, 1, 100),
+        Cutoff("College B", "OBC", "AIQ", 2023, 1, 100),
+        Cutoff("College C", "OBC", "STATE", 2022, 1, 100),
+    ])
+    assert [c.college for c in index.query(50)] == ["College A"]
+    assert [c.college for c in index.query(50, category="OBC")] == ["College B"]
+    assert [c.college for c in index.query(50, category="OBC", quota="STATE")] == ["College C"]
+    assert index.query(50, category="SC") == []
+
+# The seeded cutoff file keeps the answers of the old hardcoded college table
+def test_predict_college_backward_compatible():
+    ranks = [0, 1, 1000, 1001, 7500, 100000, 100001]
+    expected = [next((name for name, r in colleges.items() if r["rank_lower"] <= rank <= r["rank_upper"]), "No college found") for rank in ranks]
+    assert [predict_college(rank) for rank in ranks] == expected
+    assert predict_college_batch(ranks) == expected
+
+def test_cutoff_loader_reloads(tmp_path):
+    path = tmp_path / "cutoffs.csv"
+    loader = CutoffLoader(str(path))
+    assert len(loader.current()) == len(colleges)  # Falls back to the built-in table
+
+    path.write_text("college,category,quota,year,opening_rank,closing_rank\nCollege Z,GENERAL,STATE,2025,1,10\n")
+    assert loader.refresh()
+    assert [c.college for c in loader.current().query(5)] == ["College Z"]
+    assert not loader.refresh()
+
+    # The shared polling thread picks up the next rewrite on its own
+    loader.interval = 0.01
+    loader.start()
+    try:
+        path.write_text("college,category,quota,year,opening_rank,closing_rank\nCollege Y,GENERAL,STATE,2025,1,20\n")
+        deadline = time.monotonic() + 5
+        while [c.college for c in loader.current().query(5)] != ["College Y"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        loader.stop()
+    assert [c.college for c in loader.current().query(5)] == ["College Y"]
+
+# The offline job must store exactly what the per-user analysis gives, and resume from its part files
+def test_batch_insights_resumes(tmp_path):
+    output = str(tmp_path / "insights.bin")
+    work = str(tmp_path / "work")
+    assert run_batch_insights("data/historical_data.json", output, workers=1, shards=4, work_directory=work, keep_work=True) == 1
+
+    os.remove(os.path.join(work, "shard-00000.part"))
+    os.remove(output)
+    run_batch_insights("data/historical_data.json", output, workers=1, shards=4, work_directory=work)
+    assert not os.path.exists(work)
+
+    index = UserIndex.from_submissions(historical_submissions)
+    insights = InsightsFile(output)
+    user_id = historical_submissions[0].user_id
+    expected = analyze_performance(index.get(user_id))
+    assert insights.get(user_id) == json.loads(json.dumps({"analysis": expected, "insights": generate_insights(expected)}))
+    assert insights.get("unknown-user") is None
+    insights.close()
+
+# Bodies are built once per data version and dropped when the version changes
+def test_response_cache_is_keyed_by_version():
+    cache, builds = ResponseCache(), []
+    modified_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    def build():
+        builds.append(1)
+        return b"x" * 1000
+
+    first = cache.get("analysis", "v1", modified_at, build, "application/json")
+    assert cache.get("analysis", "v1", modified_at, build, "application/json") is first
+    assert first.gzipped is not None and len(first.gzipped) < len(first.body)
+    assert cache.get("analysis", "v2", modified_at, build, "application/json").etag != first.etag
+    assert len(builds) == 2
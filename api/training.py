@@ -0,0 +1,93 @@
+from collections import deque
+from typing import Optional
+import numpy as np
+from api.metrics import timed_stage
+from api.utils import rank_training_data
+
+
+class IncrementalRankTrainer:
+    """Rank model fitted from running X^T X and X^T y sufficient statistics.
+
+    Each absorbed row costs O(d^2) for d features, independent of how much history came before.
+    Old rows can be forgotten either through a sliding window over the most recent `window`
+    rows, or through exponential `decay` (a row's weight is decay ** rows absorbed after it).
+    """
+
+    def __init__(self, window: Optional[int] = None, decay: float = 1.0):
+        if window is not None and window <= 0:
+            raise ValueError("window must be positive")
+        if not 0 < decay <= 1:
+            raise ValueError("decay must be in (0, 1]")
+        if window is not None and decay != 1.0:
+            raise ValueError("Use either a sliding window or exponential decay, not both")
+
+        self.window = window
+        self.decay = decay
+        dimension = 5  # Intercept plus the four rank features
+        self.xtx = np.zeros((dimension, dimension))
+        self.xty = np.zeros(dimension)
+        self.weight = 0.0  # Effective number of rows behind the statistics
+        self._rows = deque() if window is not None else None  # (x, y) pairs still inside the window
+        self._expired = 0  # Rows subtracted since the window statistics were last rebuilt
+
+    @staticmethod
+    def _design(data):
+        X, y = rank_training_data(data)
+        return np.c_[np.ones(X.shape[0]), X], y.astype(np.float64)
+
+    def partial_fit(self, data) -> "IncrementalRankTrainer":
+        X, y = self._design(data)
+        if len(y) == 0:
+            return self
+
+        if self.decay != 1.0:
+            # Oldest row in the chunk gets decay ** (k - 1); everything before it decays by decay ** k
+            weights = self.decay ** np.arange(len(y) - 1, -1, -1, dtype=np.float64)
+            scale = self.decay ** len(y)
+            self.xtx = scale * self.xtx + (X * weights[:, None]).T @ X
+            self.xty = scale * self.xty + (X * weights[:, None]).T @ y
+            self.weight = scale * self.weight + weights.sum()
+            return self
+
+        self.xtx += X.T @ X
+        self.xty += X.T @ y
+        self.weight += len(y)
+        if self._rows is not None:
+            self._rows.extend(zip(X, y))
+            overflow = len(self._rows) - self.window
+            if overflow > 0:
+                expired = [self._rows.popleft() for _ in range(overflow)]
+                self._expired += overflow
+                if self._expired >= self.window:
+                    # Subtraction leaves rounding error behind; a full recount once per window bounds it
+                    self._rebuild()
+                else:
+                    self._subtract(np.array([x for x, _ in expired]), np.array([target for _, target in expired]))
+        return self
+
+    def _rebuild(self):
+        X = np.array([x for x, _ in self._rows])
+        y = np.array([target for _, target in self._rows])
+        self.xtx = X.T @ X
+        self.xty = X.T @ y
+        self.weight = float(len(y))
+        self._expired = 0
+
+    def remove(self, data) -> "IncrementalRankTrainer":
+        # Retract rows that were absorbed earlier, e.g. deleted submissions
+        if self.decay != 1.0 or self._rows is not None:
+            raise ValueError("remove() needs plain accumulation; the window and decay modes forget rows themselves")
+        X, y = self._design(data)
+        if len(y):
+            self._subtract(X, y)
+        return self
+
+    def _subtract(self, X: np.ndarray, y: np.ndarray):
+        self.xtx -= X.T @ X
+        self.xty -= X.T @ y
+        self.weight -= len(y)
+
+    @timed_stage("model_training")
+    def theta(self) -> np.ndarray:
+        # Symmetric pseudo-inverse: an eigendecomposition that tolerates rank-deficient statistics
+        return np.linalg.pinv(self.xtx, hermitian=True) @ self.xty
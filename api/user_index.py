@@ -0,0 +1,50 @@
+import bisect
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional
+from api.columnar import epoch_micros
+from api.models import SubmissionData
+
+
+class UserIndex:
+    """Maps user_id to that user's submissions, kept sorted by submitted_at."""
+
+    def __init__(self):
+        self._submissions: Dict[str, List[SubmissionData]] = {}
+        self._timestamps: Dict[str, List[int]] = {}  # Parallel epoch-microsecond keys for bisect
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_submissions(cls, submissions: Iterable[SubmissionData]) -> "UserIndex":
+        index = cls()
+        for submission in submissions:
+            index._submissions.setdefault(submission.user_id, []).append(submission)
+
+        # Sort once at load time; the sort is stable so equal timestamps keep list order
+        for user_id, user_submissions in index._submissions.items():
+            user_submissions.sort(key=lambda submission: epoch_micros(submission.submitted_at))
+            index._timestamps[user_id] = [epoch_micros(submission.submitted_at) for submission in user_submissions]
+        return index
+
+    def add(self, submission: SubmissionData):
+        timestamp = epoch_micros(submission.submitted_at)
+        with self._lock:
+            user_submissions = self._submissions.setdefault(submission.user_id, [])
+            timestamps = self._timestamps.setdefault(submission.user_id, [])
+            position = bisect.bisect_right(timestamps, timestamp)
+            timestamps.insert(position, timestamp)
+            user_submissions.insert(position, submission)
+
+    def get(self, user_id: str) -> Optional[List[SubmissionData]]:
+        user_submissions = self._submissions.get(user_id)
+        return list(user_submissions) if user_submissions is not None else None
+
+    def submissions(self) -> Iterator[SubmissionData]:
+        # Every submission, grouped by user and time-ordered within each user
+        for user_submissions in self._submissions.values():
+            yield from user_submissions
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._submissions
+
+    def __len__(self) -> int:
+        return len(self._submissions)
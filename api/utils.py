@@ -1,5 +1,9 @@
 import json
+import logging
 import numpy as np
+from api.metrics import timed_stage
+
+logger = logging.getLogger(__name__)
 
 def json_files(*args: str):
     names = list(args)
@@ -7,14 +11,21 @@ def json_files(*args: str):
         try:
             with open(f"data/{name}.json", "r") as file:
                 yield json.load(file)
-        except:
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("Could not load data/%s.json: %s", name, e)
             yield None
 
 
-def train_rank_predictor(data):
+def rank_training_data(data):
     # Prepare training data (X = features, y = target)
-    X = np.array([[entry.score, entry.accuracy, entry.mistakes_corrected, entry.final_score] for entry in data])
+    X = np.array([[entry.score, entry.accuracy, entry.mistakes_corrected, entry.final_score] for entry in data], dtype=float).reshape(-1, 4)
     y = np.array([entry.better_than for entry in data])  # Rank (target)
+    return X, y
+
+
+@timed_stage("model_training")
+def train_rank_predictor(data):
+    X, y = rank_training_data(data)
 
     # Add a column of ones to X for the intercept term
     X = np.c_[np.ones(X.shape[0]), X]
@@ -22,3 +33,4 @@ def train_rank_predictor(data):
     # Compute the normal equation using Pseudo-Inverse
     theta = np.linalg.pinv(X.T @ X) @ X.T @ y  # Use pinv instead of inv
     return theta
+
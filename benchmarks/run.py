@@ -0,0 +1,264 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)  # The endpoint benchmarks chdir into a scratch workspace
+
+import numpy as np
+import api.metrics
+from api.service import (
+    analyze_columns, analyze_performance, generate_insights, predict_college, predict_college_batch,
+    predict_rank, predict_rank_batch, visualize_performance,
+)
+from api.ingest import iter_submission_chunks
+from api.store import SubmissionStore
+from api.training import IncrementalRankTrainer
+from api.utils import json_files, rank_training_data, train_rank_predictor
+from benchmarks.synthetic import generate_columns, generate_quiz, generate_submission_dicts, generate_submissions
+
+BASELINE_PATH = os.path.join(REPO_ROOT, "benchmarks", "baseline.json")
+
+# name -> (submissions, users)
+SCALES = {
+    "1k": (1_000, 100),
+    "100k": (100_000, 10_000),
+    "1m": (1_000_000, 50_000),
+    "10m": (10_000_000, 100_000),
+}
+
+
+@dataclass
+class Result:
+    name: str
+    rows: int
+    seconds: float  # Median over the repeats
+    throughput: float  # Rows (or requests) per second
+    peak_bytes: Optional[int]  # Peak traced Python allocations (tracemalloc), NumPy buffers included
+
+
+def measure(name: str, fn: Callable[[], object], rows: int, repeat: int, memory: bool = True) -> Result:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    seconds = statistics.median(timings)
+
+    # Separate traced run so tracemalloc overhead stays out of the timings
+    peak = None
+    if memory:
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    result = Result(name, rows, seconds, rows / seconds if seconds > 0 else float("inf"), peak)
+    print(f"{name:<40} {rows:>10} items {seconds * 1000:>10.2f} ms  {result.throughput:>14,.0f} items/s"
+          + (f"  {peak / 2**20:>8.1f} MiB peak" if peak is not None else ""), flush=True)
+    return result
+
+
+def service_benchmarks(submissions: int, users: int, max_objects: int, max_chart_rows: int, repeat: int) -> List[Result]:
+    results = []
+    object_rows = min(submissions, max_objects)
+    objects = generate_submissions(object_rows, users)
+    columns = generate_columns(submissions, users)
+
+    results.append(measure("analyze_performance", lambda: analyze_performance(objects), object_rows, repeat))
+    results.append(measure("analyze_columns", lambda: analyze_columns(columns), submissions, repeat))
+
+    analysis = analyze_columns(columns)
+    results.append(measure("generate_insights", lambda: generate_insights(analysis), submissions, repeat))
+
+    results.append(measure("train_rank_predictor", lambda: train_rank_predictor(objects), object_rows, repeat))
+    theta = train_rank_predictor(objects)
+    features, _ = rank_training_data(objects)
+
+    calls = min(object_rows, 1000)
+    trainer = IncrementalRankTrainer().partial_fit(objects)
+    results.append(measure("incremental_rank_update", lambda: [trainer.partial_fit(objects[row:row + 1]) for row in range(calls)], calls, repeat))
+    results.append(measure("predict_rank", lambda: [predict_rank(row, theta) for row in features[:calls]], calls, repeat))
+    results.append(measure("predict_rank_batch", lambda: predict_rank_batch(features, theta), object_rows, repeat))
+    ranks = np.linspace(1, 120_000, object_rows)
+    results.append(measure("predict_college", lambda: [predict_college(rank) for rank in ranks[:calls]], calls, repeat))
+    results.append(measure("predict_college_batch", lambda: predict_college_batch(ranks), object_rows, repeat))
+
+    # Loading a history file with full model validation against the trusted compact records
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "history.ndjson")
+        with open(path, "w") as file:
+            for data in generate_submission_dicts(object_rows, users):
+                file.write(json.dumps(data) + "\n")
+        for trusted in (False, True):
+            name = "load_submissions_trusted" if trusted else "load_submissions_validated"
+            results.append(measure(name, lambda: [s for chunk in iter_submission_chunks(path, trusted=trusted) for s in chunk], object_rows, repeat))
+
+    chart_rows = min(submissions, max_chart_rows)
+    chart_analysis = analyze_columns(generate_columns(chart_rows, users))
+    with tempfile.TemporaryDirectory() as directory:
+        results.append(measure("visualize_performance", lambda: visualize_performance(chart_analysis, output_dir=directory), chart_rows, repeat, memory=False))
+    return results
+
+
+def write_workspace(directory: str, submissions: int, users: int):
+    # data/*.json files and the template, laid out the way the app expects relative to its cwd
+    os.makedirs(os.path.join(directory, "data"))
+    quiz = generate_quiz()
+    with open(os.path.join(directory, "data", "current_quiz_data.json"), "w") as file:
+        json.dump({"quiz": quiz}, file)
+    with open(os.path.join(directory, "data", "historical_data.json"), "w") as file:
+        json.dump(list(generate_submission_dicts(submissions, users)), file)
+
+    submission = next(generate_submission_dicts(1, 1, seed=1))
+    questions = quiz["questions"][:10]
+    submission.update(quiz_id=quiz["id"], quiz={key: value for key, value in quiz.items() if key != "questions"},
+                      response_map={str(question["id"]): question["options"][0]["id"] for question in questions})
+    with open(os.path.join(directory, "data", "submission_data.json"), "w") as file:
+        json.dump(submission, file)
+    shutil.copy(os.path.join(REPO_ROOT, "index.html"), os.path.join(directory, "index.html"))
+
+
+def endpoint_benchmarks(submissions: int, users: int, repeat: int) -> List[Result]:
+    results = []
+    workspace = tempfile.mkdtemp(prefix="rank-bench-")
+    previous = os.getcwd()
+    try:
+        write_workspace(workspace, submissions, users)
+        os.chdir(workspace)
+        results.append(measure("json_files", lambda: list(json_files("current_quiz_data", "historical_data", "submission_data")), submissions, repeat))
+
+        # A submission database (holding the same history) and a profiling token switch on the optional routes.
+        # api.metrics is already imported by the service benchmarks, so its token is set directly.
+        database_url = "sqlite:///data/submissions.db"
+        SubmissionStore(database_url).add_submissions(
+            submission for chunk in iter_submission_chunks("data/historical_data.json", trusted=True) for submission in chunk
+        )
+        previous_database = os.environ.get("RANK_PREDICTOR_DATABASE")
+        os.environ["RANK_PREDICTOR_DATABASE"] = database_url
+        previous_token, api.metrics.PROFILE_TOKEN = api.metrics.PROFILE_TOKEN, "benchmark"
+
+        # The app loads data relative to the cwd at import time
+        from fastapi.testclient import TestClient
+        from api.main import app
+        client = TestClient(app)
+
+        with open("data/submission_data.json") as file:
+            submission = json.load(file)
+        first = next(generate_submission_dicts(1, users))
+        user_id, quiz_id = first["user_id"], first["quiz_id"]
+        new_ids = itertools.count(10 ** 9)  # Every POST /submissions records a fresh submission
+        profile_id = client.get("/analyze-performance", headers={"X-Profile": "benchmark"}).headers["X-Profile-Id"]
+        chart_url = client.post("/analyze-performance", json=[submission]).json()["charts"]["accuracy_trends"]
+        requests = [
+            ("GET /", lambda: client.get("/")),
+            ("GET /analyze-performance", lambda: client.get("/analyze-performance")),
+            ("POST /analyze-performance", lambda: client.post("/analyze-performance", json=[submission] * 100)),
+            ("GET /charts/{key}/{name}.png", lambda: client.get(chart_url)),
+            ("GET /generate-insights", lambda: client.get("/generate-insights")),
+            ("GET /question-analysis", lambda: client.get("/question-analysis")),
+            ("POST /question-analysis", lambda: client.post("/question-analysis", json=[submission] * 100)),
+            ("POST /submissions", lambda: client.post("/submissions", json={**submission, "id": next(new_ids)})),
+            ("GET /users/{user_id}/analysis", lambda: client.get(f"/users/{user_id}/analysis")),
+            ("GET /users/{user_id}/insights", lambda: client.get(f"/users/{user_id}/insights")),
+            ("GET /percentile", lambda: client.get("/percentile", params={"score": first["final_score"], "quiz_id": quiz_id})),
+            ("GET /submissions/analysis", lambda: client.get("/submissions/analysis", params={"user_id": user_id})),
+            ("POST /predict-rank", lambda: client.post("/predict-rank", json=submission)),
+            ("POST /predict-rank/batch", lambda: client.post("/predict-rank/batch", json=[submission] * 100)),
+            ("POST /predict-college", lambda: client.post("/predict-college", json={"predicted_rank": 250})),
+            ("POST /predict-college/batch", lambda: client.post("/predict-college/batch", json={"predicted_ranks": list(range(1, 120_000, 1200))})),
+            ("GET /metrics", lambda: client.get("/metrics")),
+            ("GET /debug/profiles/{profile_id}", lambda: client.get(f"/debug/profiles/{profile_id}", headers={"X-Profile": "benchmark"})),
+        ]
+        for name, call in requests:
+            response = call()  # Warm-up also fills any per-version caches
+            if response.status_code != 200:
+                raise RuntimeError(f"{name} returned {response.status_code}: {response.text[:200]}")
+            results.append(measure(name, call, 1, repeat))
+        api.metrics.PROFILE_TOKEN = previous_token
+        if previous_database is None:
+            os.environ.pop("RANK_PREDICTOR_DATABASE", None)
+        else:
+            os.environ["RANK_PREDICTOR_DATABASE"] = previous_database
+    finally:
+        os.chdir(previous)
+        shutil.rmtree(workspace, ignore_errors=True)
+    return results
+
+
+def compare(results: List[Result], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    # A result regresses when it is slower, or peaks higher, than the baseline by more than the tolerance
+    regressions = []
+    for result in results:
+        base = baseline.get(result.name)
+        if base is None:
+            continue
+        if result.seconds > base["seconds"] * (1 + tolerance):
+            regressions.append(f"{result.name}: {result.seconds * 1000:.2f} ms vs baseline {base['seconds'] * 1000:.2f} ms")
+        if result.peak_bytes is not None and base.get("peak_bytes") and result.peak_bytes > base["peak_bytes"] * (1 + tolerance):
+            regressions.append(f"{result.name}: {result.peak_bytes / 2**20:.1f} MiB peak vs baseline {base['peak_bytes'] / 2**20:.1f} MiB")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the service functions and API routes on synthetic data.")
+    parser.add_argument("--scale", choices=SCALES, default="1k")
+    parser.add_argument("--submissions", type=int, help="Override the number of submissions for the scale")
+    parser.add_argument("--users", type=int, help="Override the number of users for the scale")
+    parser.add_argument("--max-objects", type=int, default=200_000, help="Cap for benchmarks that need one model object per row")
+    parser.add_argument("--max-file-records", type=int, default=20_000, help="Cap for the JSON files behind json_files and the routes")
+    parser.add_argument("--max-chart-rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--skip-endpoints", action="store_true")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline for the scale")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args(argv)
+
+    submissions, users = SCALES[args.scale]
+    submissions = args.submissions or submissions
+    users = args.users or users
+    print(f"scale={args.scale} submissions={submissions} users={users} python={platform.python_version()} numpy={np.__version__}")
+
+    results = service_benchmarks(submissions, users, args.max_objects, args.max_chart_rows, args.repeat)
+    if not args.skip_endpoints:
+        results += endpoint_benchmarks(min(submissions, args.max_file_records), users, args.repeat)
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baselines = json.load(file)
+    key = f"{args.scale}:{submissions}:{users}"
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"scale": key, "results": [asdict(result) for result in results]}, file, indent=2)
+
+    if args.save_baseline:
+        baselines[key] = {result.name: {"seconds": result.seconds, "peak_bytes": result.peak_bytes} for result in results}
+        with open(args.baseline, "w") as file:
+            json.dump(baselines, file, indent=2, sort_keys=True)
+        print(f"Saved baseline {key} to {args.baseline}")
+        return 0
+
+    if key not in baselines:
+        print(f"No baseline for {key}; run with --save-baseline to record one")
+        return 0
+    regressions = compare(results, baselines[key], args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
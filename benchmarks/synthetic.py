@@ -0,0 +1,149 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List
+import numpy as np
+from api.columnar import SubmissionColumns
+from api.models import Quiz, SubmissionData
+
+# Deterministic synthetic data at configurable scale, shaped like the files in data/
+
+TOPICS = [
+    "Body Fluids and Circulation", "Human Reproduction", "Reproductive Health", "Respiration and Gas Exchange",
+    "principles of inheritance and variation", "microbes in human welfare", "human health and disease",
+    "structural organisation in animals", "Cell: The Unit of Life", "Biomolecules", "Plant Kingdom",
+    "Animal Kingdom", "Morphology of Flowering Plants", "Anatomy of Flowering Plants", "Cell Cycle and Cell Division",
+    "Photosynthesis in Higher Plants", "Plant Growth and Development", "Neural Control and Coordination",
+    "Chemical Coordination and Integration", "Evolution",
+]
+
+START = datetime(2024, 7, 1, tzinfo=timezone(timedelta(hours=5, minutes=30)))
+SPAN_MICROS = 180 * 24 * 3600 * 10**6
+QUIZZES = 60
+
+
+def _quiz_dict(quiz_id: int, questions_count: int, questions: List[dict] = None) -> dict:
+    created = START - timedelta(days=30 + quiz_id)
+    quiz = {
+        "id": quiz_id, "name": None, "title": f"Synthetic Quiz {quiz_id}", "description": "",
+        "difficulty_level": None, "topic": TOPICS[quiz_id % len(TOPICS)], "time": created.isoformat(),
+        "is_published": True, "created_at": created.isoformat(), "updated_at": created.isoformat(),
+        "duration": 15, "end_time": (created + timedelta(days=1)).isoformat(), "negative_marks": 1.0,
+        "correct_answer_marks": 4.0, "shuffle": True, "show_answers": True, "lock_solutions": False,
+        "is_form": False, "show_mastery_option": False, "quiz_type": None, "is_custom": False,
+        "banner_id": None, "exam_id": None, "show_unanswered": False,
+        "ends_at": (created + timedelta(days=365)).date().isoformat(), "lives": None, "live_count": "Free Test",
+        "coin_count": -1, "questions_count": questions_count, "daily_date": "", "max_mistake_count": 15,
+    }
+    if questions is not None:
+        quiz["questions"] = questions
+    return quiz
+
+
+def generate_quiz(quiz_id: int = 43, questions: int = 128, seed: int = 0) -> dict:
+    # A quiz with its questions and options, like current_quiz_data.json
+    rng = np.random.default_rng(seed)
+    created = (START - timedelta(days=60)).isoformat()
+    correct = rng.integers(0, 4, questions)
+    difficulty = rng.integers(1, 4, questions)
+    question_list = []
+    for index in range(questions):
+        question_id = 10000 + index
+        question_list.append({
+            "id": question_id, "description": f"Synthetic question {index}", "difficulty_level": int(difficulty[index]),
+            "topic": TOPICS[quiz_id % len(TOPICS)], "is_published": True, "created_at": created, "updated_at": created,
+            "detailed_solution": "Explanation " * 40, "type": "", "is_mandatory": False, "show_in_feed": False,
+            "pyq_label": None, "topic_id": 100 + quiz_id % len(TOPICS), "reading_material_id": 2000 + index,
+            "question_from": "Q-bank", "is_saved": False, "tag": "",
+            "options": [
+                {"id": question_id * 4 + option, "description": f"Option {option}", "question_id": question_id,
+                 "is_correct": bool(option == correct[index]), "created_at": created, "updated_at": created,
+                 "unanswered": False, "photo_url": None}
+                for option in range(4)
+            ],
+        })
+    return _quiz_dict(quiz_id, questions, question_list)
+
+
+def generate_arrays(submissions: int, users: int, seed: int = 0) -> Dict[str, np.ndarray]:
+    # Every numeric field as a NumPy array; the other builders all derive from these draws
+    rng = np.random.default_rng(seed)
+    quiz_questions = rng.integers(10, 129, QUIZZES)
+    quiz_index = rng.integers(0, QUIZZES, submissions)
+    total_questions = quiz_questions[quiz_index]
+    skill = rng.beta(4, 2, submissions)
+    correct = rng.binomial(total_questions, skill * 0.9)
+    incorrect = rng.binomial(total_questions - correct, 0.5)
+    attempted = correct + incorrect
+    accuracy = np.divide(correct, attempted, out=np.zeros(submissions), where=attempted > 0)
+    return {
+        "user_index": rng.integers(0, users, submissions),
+        "quiz_index": quiz_index,
+        "submitted_at": rng.integers(0, SPAN_MICROS, submissions),
+        "score": correct * 4,
+        "accuracy": np.round(accuracy, 2),
+        "final_score": (correct * 4 - incorrect).astype(np.float64),
+        "negative_score": incorrect.astype(np.float64),
+        "better_than": rng.integers(0, 500, submissions),
+        "mistakes_corrected": rng.binomial(incorrect, 0.5),
+        "correct_answers": correct,
+        "incorrect_answers": incorrect,
+        "total_questions": total_questions,
+    }
+
+
+def generate_columns(submissions: int, users: int, seed: int = 0) -> SubmissionColumns:
+    # Builds columns directly, so the vectorized paths can run at scales where objects would not fit
+    arrays = generate_arrays(submissions, users, seed)
+    start = (START - datetime(1970, 1, 1, tzinfo=timezone.utc)) // timedelta(microseconds=1)
+    fields = ("score", "accuracy", "final_score", "negative_score", "better_than", "mistakes_corrected",
+              "correct_answers", "incorrect_answers", "total_questions")
+    return SubmissionColumns(
+        submitted_at=arrays["submitted_at"] + start,
+        topic_codes=(arrays["quiz_index"] % len(TOPICS)).astype(np.int32),
+        topics=list(TOPICS),
+        **{field: arrays[field] for field in fields},
+    )
+
+
+def generate_submission_dicts(submissions: int, users: int, seed: int = 0) -> Iterator[dict]:
+    # Raw JSON-shaped records, like historical_data.json
+    arrays = generate_arrays(submissions, users, seed)
+    quizzes = [_quiz_dict(quiz_id, 0) for quiz_id in range(QUIZZES)]
+    for row in range(submissions):
+        submitted = START + timedelta(microseconds=int(arrays["submitted_at"][row]))
+        total = int(arrays["total_questions"][row])
+        quiz = dict(quizzes[arrays["quiz_index"][row]], questions_count=total)
+        yield {
+            "id": row + 1, "quiz_id": quiz["id"], "user_id": f"user-{arrays['user_index'][row]:06d}",
+            "submitted_at": submitted.isoformat(), "created_at": submitted.isoformat(), "updated_at": submitted.isoformat(),
+            "score": int(arrays["score"][row]), "trophy_level": 1, "accuracy": f"{round(arrays['accuracy'][row] * 100)} %",
+            "speed": "100", "final_score": str(arrays["final_score"][row]), "negative_score": str(arrays["negative_score"][row]),
+            "correct_answers": int(arrays["correct_answers"][row]), "incorrect_answers": int(arrays["incorrect_answers"][row]),
+            "source": "live", "type": "topic", "started_at": submitted.isoformat(),
+            "ended_at": (submitted + timedelta(minutes=15)).isoformat(), "duration": "15:00",
+            "better_than": int(arrays["better_than"][row]), "total_questions": total,
+            "rank_text": f"Topic Rank - #{int(arrays['better_than'][row])}",
+            "mistakes_corrected": int(arrays["mistakes_corrected"][row]),
+            "initial_mistake_count": int(arrays["incorrect_answers"][row]), "response_map": {}, "quiz": quiz,
+        }
+
+
+def generate_submissions(submissions: int, users: int, seed: int = 0) -> List[SubmissionData]:
+    # Already-typed models built without validation, so generation does not dominate the run
+    arrays = generate_arrays(submissions, users, seed)
+    quizzes = [Quiz.model_construct(**_quiz_dict(quiz_id, 0)) for quiz_id in range(QUIZZES)]
+    rows = []
+    for row in range(submissions):
+        submitted = START + timedelta(microseconds=int(arrays["submitted_at"][row]))
+        rows.append(SubmissionData.model_construct(
+            id=row + 1, quiz_id=quizzes[arrays["quiz_index"][row]].id, user_id=f"user-{arrays['user_index'][row]:06d}",
+            submitted_at=submitted, created_at=submitted, updated_at=submitted,
+            score=int(arrays["score"][row]), trophy_level=1, accuracy=float(arrays["accuracy"][row]), speed=100,
+            final_score=float(arrays["final_score"][row]), negative_score=float(arrays["negative_score"][row]),
+            correct_answers=int(arrays["correct_answers"][row]), incorrect_answers=int(arrays["incorrect_answers"][row]),
+            source="live", type="topic", started_at=submitted, ended_at=submitted + timedelta(minutes=15),
+            duration="15:00", better_than=int(arrays["better_than"][row]),
+            total_questions=int(arrays["total_questions"][row]), rank_text="", response_map={},
+            mistakes_corrected=int(arrays["mistakes_corrected"][row]),
+            initial_mistake_count=int(arrays["incorrect_answers"][row]), quiz=quizzes[arrays["quiz_index"][row]],
+        ))
+    return rows